@@ -0,0 +1,43 @@
+"""price_history
+
+Revision ID: 3c9d2e71b5a4
+Revises: fa81e34e33f8
+Create Date: 2026-10-16 10:12:31.482019
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9d2e71b5a4'
+down_revision: Union[str, Sequence[str], None] = 'fa81e34e33f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('price_history',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), autoincrement=True, nullable=False),
+    sa.Column('priceId', sa.Integer(), nullable=False),
+    sa.Column('priceCents', sa.Integer(), nullable=False),
+    sa.Column('recordedAt', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['priceId'], ['prices.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_price_history_priceId_recordedAt', 'price_history', ['priceId', 'recordedAt'], unique=False)
+
+    # ✅ ponto de partida: preço atual de cada par vira o 1º registro do histórico
+    op.execute(
+        "INSERT INTO price_history (\"priceId\", \"priceCents\", \"recordedAt\") "
+        "SELECT id, CAST(ROUND(price * 100) AS INTEGER), CURRENT_TIMESTAMP FROM prices"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_price_history_priceId_recordedAt', table_name='price_history')
+    op.drop_table('price_history')
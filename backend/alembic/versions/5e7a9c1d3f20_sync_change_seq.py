@@ -0,0 +1,67 @@
+"""sync_change_seq
+
+Revision ID: 5e7a9c1d3f20
+Revises: 8b41f0c6d2e9
+Create Date: 2026-10-16 12:20:07.613402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e7a9c1d3f20'
+down_revision: Union[str, Sequence[str], None] = '8b41f0c6d2e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+_SEQ_TYPE = sa.BigInteger().with_variant(sa.Integer(), 'sqlite')
+_TABLES = ('products', 'markets', 'prices')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in _TABLES:
+        op.add_column(table, sa.Column('changeSeq', _SEQ_TYPE, nullable=True))
+        op.create_index(op.f(f'ix_{table}_changeSeq'), table, ['changeSeq'], unique=False)
+
+    op.create_table('sync_counter',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('sync_tombstones',
+    sa.Column('id', _SEQ_TYPE, autoincrement=True, nullable=False),
+    sa.Column('entity', sa.String(), nullable=False),
+    sa.Column('entityId', sa.String(), nullable=False),
+    sa.Column('changeSeq', _SEQ_TYPE, nullable=False),
+    sa.Column('deletedAt', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sync_tombstones_changeSeq'), 'sync_tombstones', ['changeSeq'], unique=False)
+
+    # ✅ linhas que já existem ganham números únicos (products, depois markets, depois prices),
+    # para a 1ª carga (since=0) poder paginar pelo changeSeq
+    offset = "0"
+    for table in _TABLES:
+        op.execute(
+            f'UPDATE {table} SET "changeSeq" = s.rn + ({offset}) '
+            f'FROM (SELECT id, ROW_NUMBER() OVER (ORDER BY id) AS rn FROM {table}) s '
+            f'WHERE {table}.id = s.id'
+        )
+        offset += f" + (SELECT COUNT(*) FROM {table})"
+    op.execute(f"INSERT INTO sync_counter (id, value) SELECT 1, {offset}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_sync_tombstones_changeSeq'), table_name='sync_tombstones')
+    op.drop_table('sync_tombstones')
+    op.drop_table('sync_counter')
+    for table in reversed(_TABLES):
+        op.drop_index(op.f(f'ix_{table}_changeSeq'), table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('changeSeq')
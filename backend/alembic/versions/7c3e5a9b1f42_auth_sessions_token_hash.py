@@ -0,0 +1,82 @@
+"""auth_sessions_token_hash
+
+Revision ID: 7c3e5a9b1f42
+Revises: 9d2f6b8e4a17
+Create Date: 2026-10-16 14:10:31.402215
+
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3e5a9b1f42'
+down_revision: Union[str, Sequence[str], None] = '9d2f6b8e4a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# igual a auth_sessions.AUTH_SESSION_TTL_SEC (sessões antigas ganham a validade padrão)
+_TTL_DAYS = 30
+_BATCH = 1000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('auth_sessions', sa.Column('tokenHash', sa.String(), nullable=True))
+
+    # ✅ troca o token em texto pelo SHA-256 (em lotes, feito em Python p/ funcionar em SQLite e Postgres)
+    bind = op.get_bind()
+    sessions = sa.table('auth_sessions', sa.column('id', sa.Integer), sa.column('token', sa.String),
+                        sa.column('tokenHash', sa.String))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(sessions.c.id, sessions.c.token)
+            .where(sessions.c.id > last_id)
+            .order_by(sessions.c.id)
+            .limit(_BATCH)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            sessions.update().where(sessions.c.id == sa.bindparam('b_id')).values(tokenHash=sa.bindparam('b_hash')),
+            [{'b_id': r.id, 'b_hash': hashlib.sha256(r.token.encode('utf-8')).hexdigest()} for r in rows],
+        )
+        last_id = rows[-1].id
+
+    # ✅ sessões sem validade (todas até aqui) ganham createdAt + TTL
+    if bind.dialect.name == 'sqlite':
+        op.execute(
+            f"UPDATE auth_sessions SET \"expiresAt\" = datetime(COALESCE(\"createdAt\", CURRENT_TIMESTAMP), '+{_TTL_DAYS} days') "
+            "WHERE \"expiresAt\" IS NULL"
+        )
+    else:
+        op.execute(
+            f"UPDATE auth_sessions SET \"expiresAt\" = COALESCE(\"createdAt\", now()) + interval '{_TTL_DAYS} days' "
+            "WHERE \"expiresAt\" IS NULL"
+        )
+
+    op.drop_index(op.f('ix_auth_sessions_token'), table_name='auth_sessions')
+    with op.batch_alter_table('auth_sessions') as batch_op:
+        batch_op.drop_column('token')
+        batch_op.alter_column('tokenHash', existing_type=sa.String(), nullable=False)
+    op.create_index(op.f('ix_auth_sessions_tokenHash'), 'auth_sessions', ['tokenHash'], unique=True)
+    op.create_index(op.f('ix_auth_sessions_expiresAt'), 'auth_sessions', ['expiresAt'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # o token original não volta: a coluna token recebe o hash e as sessões antigas
+    # deixam de autenticar (o usuário faz login de novo)
+    op.drop_index(op.f('ix_auth_sessions_expiresAt'), table_name='auth_sessions')
+    op.drop_index(op.f('ix_auth_sessions_tokenHash'), table_name='auth_sessions')
+    op.add_column('auth_sessions', sa.Column('token', sa.String(), nullable=True))
+    op.execute('UPDATE auth_sessions SET token = "tokenHash"')
+    with op.batch_alter_table('auth_sessions') as batch_op:
+        batch_op.drop_column('tokenHash')
+        batch_op.alter_column('token', existing_type=sa.String(), nullable=False)
+    op.create_index(op.f('ix_auth_sessions_token'), 'auth_sessions', ['token'], unique=True)
@@ -0,0 +1,54 @@
+"""price_alerts
+
+Revision ID: 8b41f0c6d2e9
+Revises: 3c9d2e71b5a4
+Create Date: 2026-10-16 11:03:54.271846
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b41f0c6d2e9'
+down_revision: Union[str, Sequence[str], None] = '3c9d2e71b5a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('price_alerts',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('userId', sa.String(), nullable=True),
+    sa.Column('sessionId', sa.String(), nullable=True),
+    sa.Column('productId', sa.String(), nullable=False),
+    sa.Column('marketId', sa.String(), nullable=True),
+    sa.Column('targetPrice', sa.Float(), nullable=False),
+    sa.Column('isActive', sa.Boolean(), nullable=False),
+    sa.Column('createdAt', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('triggeredAt', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('triggeredPrice', sa.Float(), nullable=True),
+    sa.Column('triggeredMarketId', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['marketId'], ['markets.id'], ),
+    sa.ForeignKeyConstraint(['productId'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['userId'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_price_alerts_id'), 'price_alerts', ['id'], unique=False)
+    op.create_index(op.f('ix_price_alerts_productId'), 'price_alerts', ['productId'], unique=False)
+    op.create_index('ix_price_alerts_productId_targetPrice', 'price_alerts', ['productId', 'targetPrice'], unique=False)
+    op.create_index(op.f('ix_price_alerts_sessionId'), 'price_alerts', ['sessionId'], unique=False)
+    op.create_index(op.f('ix_price_alerts_userId'), 'price_alerts', ['userId'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_price_alerts_userId'), table_name='price_alerts')
+    op.drop_index(op.f('ix_price_alerts_sessionId'), table_name='price_alerts')
+    op.drop_index('ix_price_alerts_productId_targetPrice', table_name='price_alerts')
+    op.drop_index(op.f('ix_price_alerts_productId'), table_name='price_alerts')
+    op.drop_index(op.f('ix_price_alerts_id'), table_name='price_alerts')
+    op.drop_table('price_alerts')
@@ -0,0 +1,28 @@
+"""prices_product_price_index
+
+Revision ID: 9d2f6b8e4a17
+Revises: 5e7a9c1d3f20
+Create Date: 2026-10-16 13:02:45.118930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d2f6b8e4a17'
+down_revision: Union[str, Sequence[str], None] = '5e7a9c1d3f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_prices_productId_price', 'prices', ['productId', 'price'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_prices_productId_price', table_name='prices')
@@ -0,0 +1,158 @@
+# alerts_engine.py
+"""
+Avaliação incremental de alertas de preço.
+
+Quando o preço de um par (mercado, produto) cai de `old` para `new`, disparam os alertas
+ATIVOS do produto (no mercado ou em qualquer mercado) com new <= alvo < old. Isso é UMA
+busca por intervalo no índice composto (productId, targetPrice): O(log n + disparos) por
+mudança de preço, sem carregar os outros alertas do produto.
+
+O banco é a fonte (não há índice por processo): com vários workers, um alerta criado no
+worker A precisa disparar com um preço gravado no worker B.
+
+A rota não espera nada disso: as mudanças vão para uma fila e uma thread avalia em lote
+(1 SELECT por até ALERTS_QUERY_CHUNK mudanças) e grava os disparos (isActive=False, triggered*).
+"""
+import queue
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, or_, select, update
+
+from db import SessionLocal
+from models import PriceAlert
+from price_history import to_cents
+
+
+ALERTS_QUEUE_MAX = 10_000
+ALERTS_FLUSH_BATCH = 200
+ALERTS_QUERY_CHUNK = 100
+
+
+def _crossing(r: dict):
+    """Condição SQL de "alvo cruzado" para uma mudança (alvos comparados em centavos)."""
+    lo = (to_cents(r["price"]) - 0.5) / 100.0
+    cond = [
+        PriceAlert.productId == r["productId"],
+        or_(PriceAlert.marketId.is_(None), PriceAlert.marketId == r["marketId"]),
+        PriceAlert.targetPrice >= lo,
+    ]
+    if r.get("oldPrice") is not None:
+        cond.append(PriceAlert.targetPrice < (to_cents(r["oldPrice"]) - 0.5) / 100.0)
+    return and_(*cond)
+
+
+def _matches(r: dict, product_id: str, market_id: Optional[str], target: float) -> bool:
+    if product_id != r["productId"] or (market_id and market_id != r["marketId"]):
+        return False
+    cents = to_cents(target)
+    old = r.get("oldPrice")
+    return to_cents(r["price"]) <= cents and (old is None or cents < to_cents(old))
+
+
+def find_crossed(db, rows: List[dict]) -> List[dict]:
+    """Disparos das mudanças `rows`: [{alertId, marketId, productId, price, at}] (1 por alerta)."""
+    fired: Dict[str, dict] = {}
+    for i in range(0, len(rows), ALERTS_QUERY_CHUNK):
+        chunk = rows[i:i + ALERTS_QUERY_CHUNK]
+        stmt = select(PriceAlert.id, PriceAlert.productId, PriceAlert.marketId, PriceAlert.targetPrice).where(
+            PriceAlert.isActive.is_(True),
+            or_(*(_crossing(r) for r in chunk)),
+        )
+        for alert_id, product_id, market_id, target in db.execute(stmt):
+            if alert_id in fired:
+                continue
+            # a linha pode ter vindo de qualquer mudança do bloco: atribui à primeira que cruzou
+            for r in chunk:
+                if _matches(r, product_id, market_id, target):
+                    fired[alert_id] = {
+                        "alertId": alert_id,
+                        "marketId": r["marketId"],
+                        "productId": r["productId"],
+                        "price": r["price"],
+                        "at": r["at"],
+                    }
+                    break
+    return list(fired.values())
+
+
+price_changes: "queue.Queue[dict]" = queue.Queue(maxsize=ALERTS_QUEUE_MAX)
+
+_worker_lock = threading.Lock()
+_worker: Optional[threading.Thread] = None
+
+
+def _evaluate(rows: List[dict]):
+    db = SessionLocal()
+    try:
+        for ev in find_crossed(db, rows):
+            db.execute(
+                update(PriceAlert)
+                .where(PriceAlert.id == ev["alertId"], PriceAlert.isActive.is_(True))
+                .values(
+                    isActive=False,
+                    triggeredAt=ev["at"],
+                    triggeredPrice=ev["price"],
+                    triggeredMarketId=ev["marketId"],
+                )
+            )
+        db.commit()
+    except Exception as e:
+        print("ALERTS_EVALUATE_ERROR:", repr(e))
+        try:
+            db.rollback()
+        except Exception:
+            pass
+    finally:
+        db.close()
+
+
+def _worker_loop():
+    while True:
+        rows = [price_changes.get()]
+        while len(rows) < ALERTS_FLUSH_BATCH:
+            try:
+                rows.append(price_changes.get_nowait())
+            except queue.Empty:
+                break
+        _evaluate(rows)
+        for _ in rows:
+            price_changes.task_done()
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_worker_loop, name="price-alerts", daemon=True)
+            _worker.start()
+
+
+def evaluate_price_changes(rows: Iterable[dict]):
+    """rows: [{"marketId", "productId", "price", "oldPrice"?}] já gravados."""
+    now = datetime.now(timezone.utc)
+    queued = False
+    overflow = []
+    for r in rows:
+        if r.get("oldPrice") is not None and to_cents(r["price"]) >= to_cents(r["oldPrice"]):
+            continue
+        change = {
+            "marketId": r["marketId"],
+            "productId": r["productId"],
+            "price": r["price"],
+            "oldPrice": r.get("oldPrice"),
+            "at": now,
+        }
+        try:
+            price_changes.put_nowait(change)
+            queued = True
+        except queue.Full:
+            overflow.append(change)
+    if overflow:
+        # fila cheia: avalia direto (mais lento, mas não perde o disparo)
+        _evaluate(overflow)
+    if queued:
+        _ensure_worker()
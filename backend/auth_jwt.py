@@ -1,5 +1,7 @@
 import os
+import threading
 import time
+from collections import OrderedDict
 import jwt
 from fastapi import Depends, HTTPException, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -7,7 +9,8 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 # ✅ ADICIONADO (fallback por sessão/token salvo no SQLite)
 from sqlalchemy.orm import Session
 from db import get_db
-from models import AuthSession, User
+from models import User
+from auth_sessions import resolve_session
 
 JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret-change-me")
 JWT_ALG = "HS256"
@@ -15,6 +18,10 @@ JWT_EXPIRES_SEC = 60 * 60 * 24 * 7  # 7 dias
 
 security = HTTPBearer(auto_error=False)
 
+# ✅ NOVO: cache de usuário (JWT válido -> campos do User sem ir ao banco)
+USER_CACHE_TTL_SEC = float(os.getenv("USER_CACHE_TTL_SEC", "60"))
+USER_CACHE_MAX = int(os.getenv("USER_CACHE_MAX", "10000"))
+
 
 def create_jwt(user_id: str, email: str, account_type: str = "user"):
     now = int(time.time())
@@ -108,6 +115,95 @@ class _UserCompat:
         }
 
 
+# ✅ NOVO: fast path do get_current_user
+# - guarda só os campos que as rotas usam para autorizar (id / tipo / plano / admin)
+# - LRU limitado + TTL: mudança feita por outro worker aparece em até USER_CACHE_TTL_SEC
+# - quem muda plano / role / accountType chama invalidate_user(id) depois do commit
+#   (webhook do billing, bootstrap-admin, callback do Google, verificação de e-mail)
+_USER_CACHED_FIELDS = ("id", "email", "name", "accountType", "plan", "role", "isAdmin", "emailVerified")
+
+
+class UserCache:
+    def __init__(self, max_items: int = USER_CACHE_MAX, ttl_sec: float = USER_CACHE_TTL_SEC):
+        self._lock = threading.Lock()
+        self.max_items = max_items
+        self.ttl_sec = ttl_sec
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (expira_em, campos)
+
+    def get(self, user_id: str) -> dict | None:
+        with self._lock:
+            item = self._data.get(user_id)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._data[user_id]
+                return None
+            self._data.move_to_end(user_id)
+            return item[1]
+
+    def put(self, user_id: str, values: dict):
+        with self._lock:
+            self._data[user_id] = (time.monotonic() + self.ttl_sec, values)
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._data.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+user_cache = UserCache()
+
+
+def invalidate_user(user_id: str | None):
+    if user_id:
+        user_cache.invalidate(user_id)
+
+
+class _UserSnapshot:
+    """
+    Campos do User vindos do cache. Atributo de User fora do cache (ex.: passwordHash)
+    carrega a linha do banco na primeira vez que alguém pedir.
+    """
+
+    def __init__(self, values: dict, loader):
+        self.__dict__.update(values)
+        self._loader = loader
+        self._row = None
+
+    def __getattr__(self, name):
+        # só chega aqui para o que não está no cache
+        if name.startswith("_") or not hasattr(User, name):
+            raise AttributeError(name)
+        if self._row is None:
+            self._row = self._loader()
+            if self._row is None:
+                raise AttributeError(name)
+        return getattr(self._row, name)
+
+
+_USER_CACHED_COLUMNS = tuple(getattr(User, f) for f in _USER_CACHED_FIELDS)
+
+
+def _load_user(db: Session, user_id: str, row: tuple | None = None):
+    """row: campos já lidos junto com a sessão (_USER_CACHED_COLUMNS), evita outro SELECT."""
+    user_id = str(user_id)
+    values = None if row else user_cache.get(user_id)
+    if values is None:
+        if row is None:
+            row = db.query(*_USER_CACHED_COLUMNS).filter(User.id == user_id).first()
+            if row is None:
+                return None
+        values = dict(zip(_USER_CACHED_FIELDS, row))
+        user_cache.put(user_id, values)
+    return _UserSnapshot(values, lambda: db.get(User, user_id))
+
+
 def _wrap_user(u: User, token_type: str | None = None):
     # ✅ mantém retorno como "User", mas com compat total
     # (isso resolve rotas que fazem user["id"])
@@ -145,16 +241,11 @@ def get_current_user(
         if not user_id:
             raise HTTPException(status_code=401, detail="invalid token")
 
-        # ✅ preferimos retornar o User real do banco (mais compatível com rotas)
-        u = db.query(User).filter(User.id == user_id).first()
+        # ✅ campos do User via cache (sem banco no caminho quente);
+        # o resto dos atributos do User continua acessível (carregado sob demanda)
+        u = _load_user(db, user_id)
         if u:
-            # ✅ mantém compatibilidade: algumas partes do front/fluxo usam "type"
-            try:
-                setattr(u, "type", getattr(u, "accountType", data.get("type", "user")))
-            except Exception:
-                pass
-
-            # ✅ NOVO: retorna wrapped (compat com user["id"])
+            # ✅ NOVO: retorna wrapped (compat com user["id"]); type = accountType
             return _wrap_user(u, token_type=data.get("type", "user"))
 
         # fallback se por algum motivo usuário não existir no banco
@@ -174,22 +265,16 @@ def get_current_user(
     # 2) FALLBACK: TOKEN SALVO NO SQLITE (AuthSession)
     # ==========================
     try:
-        sess = db.query(AuthSession).filter(AuthSession.token == token).first()
-        if not sess:
+        # ✅ NOVO: hash do token + validade, sessão e usuário num SELECT só (com cache)
+        user_id, row = resolve_session(db, token, _USER_CACHED_COLUMNS)
+        if not user_id:
             raise HTTPException(status_code=401, detail="invalid token")
 
-        u = db.query(User).filter(User.id == sess.userId).first()
+        u = _load_user(db, user_id, row)
         if not u:
             raise HTTPException(status_code=401, detail="invalid token")
 
-        # ✅ compatibilidade: "type" baseado no seu models.py (accountType)
-        try:
-            setattr(u, "type", getattr(u, "accountType", "user"))
-        except Exception:
-            pass
-
-        # ✅ retorna o User real (melhor para rotas como billing, me, etc.)
-        # ✅ NOVO: wrapped (compat com user["id"])
+        # ✅ NOVO: wrapped (compat com user["id"]); type = accountType
         return _wrap_user(u, token_type=getattr(u, "accountType", "user"))
 
     except HTTPException:
@@ -0,0 +1,170 @@
+# auth_sessions.py
+"""
+Sessões por token opaco (auth_sessions) — fallback do get_current_user quando o token
+não é JWT.
+
+- o banco guarda só o SHA-256 do token (tokenHash): vazamento da tabela não vira login
+  (o token tem 256 bits aleatórios, então hash simples sem salt basta)
+- toda sessão nasce com expiresAt (AUTH_SESSION_TTL_SEC) e sessão vencida não autentica
+- token -> (userId, expira) resolvido com 1 SELECT com JOIN em users (já traz os campos
+  do cache de usuário) e guardado num cache curto, positivo e negativo
+- SessionSweeper (thread em background) apaga sessões vencidas em lotes pelo índice
+  de expiresAt, sem travar a tabela inteira
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from db import SessionLocal
+from models import AuthSession, User
+
+
+AUTH_SESSION_TTL_SEC = int(os.getenv("AUTH_SESSION_TTL_SEC", str(60 * 60 * 24 * 30)))  # 30 dias
+AUTH_SESSION_CACHE_TTL_SEC = float(os.getenv("AUTH_SESSION_CACHE_TTL_SEC", "30"))
+AUTH_SESSION_NEGATIVE_TTL_SEC = float(os.getenv("AUTH_SESSION_NEGATIVE_TTL_SEC", "10"))
+AUTH_SESSION_CACHE_MAX = int(os.getenv("AUTH_SESSION_CACHE_MAX", "10000"))
+AUTH_SESSION_SWEEP_SEC = float(os.getenv("AUTH_SESSION_SWEEP_SEC", "3600"))
+AUTH_SESSION_SWEEP_BATCH = 1000
+
+
+def hash_session_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _now_utc() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _epoch(dt: Optional[datetime]) -> float:
+    if dt is None:
+        return 0.0
+    # SQLite devolve datetime sem fuso (gravado em UTC)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def new_auth_session(token: str, user_id: str, provider: str = "google") -> AuthSession:
+    """AuthSession pronta para db.add(): guarda o hash do token e já sai com validade."""
+    return AuthSession(
+        tokenHash=hash_session_token(token),
+        userId=user_id,
+        provider=provider,
+        expiresAt=_now_utc() + timedelta(seconds=AUTH_SESSION_TTL_SEC),
+    )
+
+
+class SessionCache:
+    """tokenHash -> (válido_no_cache_até, userId | None, sessão_expira_em)."""
+
+    def __init__(self, max_items: int = AUTH_SESSION_CACHE_MAX):
+        self._lock = threading.Lock()
+        self.max_items = max_items
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[tuple]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item
+
+    def put(self, key: str, user_id: Optional[str], expires_at: float):
+        ttl = AUTH_SESSION_CACHE_TTL_SEC if user_id else AUTH_SESSION_NEGATIVE_TTL_SEC
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, user_id, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+session_cache = SessionCache()
+
+
+def resolve_session(db: Session, token: str, user_columns=()) -> Tuple[Optional[str], Optional[tuple]]:
+    """
+    (userId, linha com user_columns) da sessão válida do token, ou (None, None).
+    Com hit no cache a linha vem None (o chamador usa o cache de usuário).
+    """
+    key = hash_session_token(token)
+    now = time.time()
+
+    hit = session_cache.get(key)
+    if hit is not None:
+        _, user_id, expires_at = hit
+        if user_id and expires_at > now:
+            return user_id, None
+        if not user_id:
+            return None, None
+
+    row = db.execute(
+        select(AuthSession.userId, AuthSession.expiresAt, *user_columns)
+        .join(User, User.id == AuthSession.userId)
+        .where(AuthSession.tokenHash == key)
+    ).first()
+    if row is None or _epoch(row[1]) <= now:
+        session_cache.put(key, None, 0.0)
+        return None, None
+
+    session_cache.put(key, row[0], _epoch(row[1]))
+    return row[0], tuple(row[2:])
+
+
+def purge_expired_sessions(batch_size: int = AUTH_SESSION_SWEEP_BATCH) -> int:
+    """Apaga sessões vencidas em lotes (1 transação curta por lote). Devolve quantas."""
+    total = 0
+    db = SessionLocal()
+    try:
+        while True:
+            ids = select(AuthSession.id).where(AuthSession.expiresAt < _now_utc()).limit(batch_size)
+            n = db.execute(
+                delete(AuthSession).where(AuthSession.id.in_(ids)).execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+            total += n or 0
+            if not n or n < batch_size:
+                break
+    finally:
+        db.close()
+    return total
+
+
+class SessionSweeper:
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name="auth-session-sweeper", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            try:
+                n = purge_expired_sessions()
+                if n:
+                    print("AUTH_SESSION_SWEEP: deleted", n)
+            except Exception as e:
+                print("AUTH_SESSION_SWEEP_ERROR:", repr(e))
+            time.sleep(AUTH_SESSION_SWEEP_SEC)
+
+
+session_sweeper = SessionSweeper()
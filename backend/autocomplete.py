@@ -0,0 +1,352 @@
+# autocomplete.py
+"""
+Autocomplete por prefixo de nomes de produtos e mercados (array ordenado + bisect).
+
+- chave = nome normalizado (sem acento, minúsculo); também indexa o nome a partir da
+  2ª/3ª/4ª palavra, para "arroz" achar "Tio João Arroz". A chave NÃO é copiada: cada
+  posição do array guarda (ref do nome, offset da palavra) em arrays compactos, e o texto
+  normalizado fica uma vez só por nome
+- ranking por popularidade = quantos preços o produto/mercado tem; começa com o COUNT do
+  banco no load() e sobe a cada preço novo (catalog_hooks.prices_saved)
+- top-N de QUALQUER prefixo sem varrer o intervalo: uma árvore de segmentos sobre o array
+  ordenado guarda em cada nó o nome mais popular do trecho; a consulta desce só pelos
+  nós mais bem colocados (best-first): O(N · log n), tanto para "a" quanto para "leite"
+- um array por tipo (produto / mercado): filtrar por tipo não precisa descartar nada
+- escrita não mexe no array grande: nome novo vai para uma lista lateral ordenada
+  (pequena, varrida na consulta); nome antigo vira folha morta na árvore. Quando a lista
+  lateral passa de AUTOCOMPLETE_MAX_PENDING, quando products/markets mudam no banco
+  (escritas de outros workers) ou a cada AUTOCOMPLETE_MAX_AGE_SEC (popularidade vinda de
+  outros workers), o índice é remontado do banco FORA do lock e trocado de uma vez
+  (index_reload.IndexReloader)
+"""
+import bisect
+import heapq
+import os
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from index_reload import IndexReloader
+from models import Market, Price, Product
+from search_index import raw_tokens
+
+
+AUTOCOMPLETE_MAX_WORD_STARTS = 4
+AUTOCOMPLETE_MAX_PENDING = 1024
+AUTOCOMPLETE_MAX_AGE_SEC = int(os.getenv("AUTOCOMPLETE_MAX_AGE_SEC", "900"))
+
+KINDS = ("product", "market")
+
+_WORST = (float("inf"),)
+_DEAD, _MAIN, _PENDING = 0, 1, 2
+
+
+def _normalize(name: str) -> Tuple[str, List[int]]:
+    """(texto normalizado, offsets das primeiras palavras indexadas)."""
+    tokens = raw_tokens(name)
+    offsets, pos = [], 0
+    for token in tokens[:AUTOCOMPLETE_MAX_WORD_STARTS]:
+        offsets.append(pos)
+        pos += len(token) + 1
+    return " ".join(tokens), offsets
+
+
+class _SuffixView:
+    """Sequência "virtual" das chaves (norm[offset:]) para o bisect, sem guardar as strings."""
+
+    __slots__ = ("refs", "offs", "norms")
+
+    def __init__(self, refs: array, offs: array, norms: List[str]):
+        self.refs, self.offs, self.norms = refs, offs, norms
+
+    def __len__(self):
+        return len(self.refs)
+
+    def __getitem__(self, i: int) -> str:
+        return self.norms[self.refs[i]][self.offs[i]:]
+
+
+class _KeyTable:
+    """Chaves de um tipo: array ordenado + árvore de segmentos (melhor ref por trecho) + lista lateral."""
+
+    def __init__(self, refs: array, offs: array, norms: List[str], rank):
+        self.refs = refs
+        self.offs = offs
+        self.view = _SuffixView(refs, offs, norms)
+        self.n = len(refs)
+        self._rank = rank
+        # folhas em [n, 2n): ref vivo ou -1 (morto); nó interno = melhor dos 2 filhos
+        self.tree = array("i", [-1]) * (2 * self.n)
+        self.tree[self.n:] = refs
+        self.pending: List[Tuple[str, int]] = []
+
+    def build(self, ranks: List[tuple]):
+        tree, key = self.tree, ranks.__getitem__
+        for i in range(self.n - 1, 0, -1):
+            a, b = tree[2 * i], tree[2 * i + 1]
+            tree[i] = a if b < 0 or (a >= 0 and key(a) <= key(b)) else b
+
+    def _better(self, a: int, b: int) -> int:
+        if a < 0:
+            return b
+        if b < 0:
+            return a
+        return a if self._rank(a) <= self._rank(b) else b
+
+    def _positions(self, ref: int, norm: str, offsets: List[int]):
+        for off in offsets:
+            key = norm[off:]
+            i = bisect.bisect_left(self.view, key)
+            while i < self.n and self.view[i] == key:
+                if self.refs[i] == ref and self.offs[i] == off:
+                    yield i
+                    break
+                i += 1
+
+    def refresh(self, ref: int, norm: str, offsets: List[int], alive: bool):
+        """Recalcula o caminho até a raiz das folhas de ref (popularidade subiu / nome saiu)."""
+        tree = self.tree
+        for i in self._positions(ref, norm, offsets):
+            pos = i + self.n
+            tree[pos] = ref if alive else -1
+            pos >>= 1
+            while pos:
+                tree[pos] = self._better(tree[2 * pos], tree[2 * pos + 1])
+                pos >>= 1
+
+    def top(self, prefix: str, n: int) -> List[int]:
+        end = prefix + "\uffff"
+        rank, tree = self._rank, self.tree
+        heap = []
+
+        def push(node):
+            ref = tree[node]
+            if ref >= 0:
+                heap.append((rank(ref), node))
+
+        lo = bisect.bisect_left(self.view, prefix) + self.n
+        hi = bisect.bisect_left(self.view, end) + self.n
+        while lo < hi:
+            if lo & 1:
+                push(lo)
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                push(hi)
+            lo >>= 1
+            hi >>= 1
+        heapq.heapify(heap)
+
+        out, seen = [], set()
+        while heap and len(out) < n:
+            _, node = heapq.heappop(heap)
+            if node >= self.n:
+                ref = tree[node]
+                if ref not in seen:
+                    seen.add(ref)
+                    out.append(ref)
+                continue
+            for child in (2 * node, 2 * node + 1):
+                ref = tree[child]
+                if ref >= 0:
+                    heapq.heappush(heap, (rank(ref), child))
+
+        plo = bisect.bisect_left(self.pending, (prefix,))
+        phi = bisect.bisect_left(self.pending, (end,))
+        if plo < phi:
+            seen.update(ref for _, ref in self.pending[plo:phi])
+            out = heapq.nsmallest(n, seen, key=rank)
+        return out
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded_at: Optional[float] = None
+        self._replay: Optional[List[tuple]] = None
+        self._reset()
+
+    def _reset(self):
+        # por ref: tipo, id, nome exibido, texto normalizado, popularidade
+        self._kinds: List[str] = []
+        self._ids: List[str] = []
+        self._names: List[str] = []
+        self._norms: List[str] = []
+        self._pop = array("d")
+        # por tipo: id -> ref vivo
+        self._ref_by_id: Dict[str, Dict[str, int]] = {kind: {} for kind in KINDS}
+        # por ref: onde estão as chaves (_MAIN / _PENDING) ou _DEAD
+        self._where = bytearray()
+        self._tables: Dict[str, _KeyTable] = {}
+        self._pending_total = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def __len__(self):
+        return sum(len(ids) for ids in self._ref_by_id.values())
+
+    def _rank(self, ref: int):
+        # popularidade desc, depois nome mais curto
+        if ref < 0:
+            return _WORST
+        name = self._names[ref]
+        return (-self._pop[ref], len(name), name)
+
+    def is_stale(self) -> bool:
+        # lista lateral grande demais: a consulta passaria a varrê-la
+        return self._pending_total > AUTOCOMPLETE_MAX_PENDING
+
+    # ---------- carga ----------
+    def load(self, db: Session):
+        """Monta o índice novo fora do lock e troca de uma vez: consultas nunca esperam o build."""
+        with self._lock:
+            # escritas durante o build são reaplicadas no índice novo
+            self._replay = []
+        try:
+            fresh = PrefixIndex()
+            fresh._build(db)
+        except BaseException:
+            with self._lock:
+                self._replay = None
+            raise
+        with self._lock:
+            fresh.loaded_at = time.monotonic()
+            for op, *args in self._replay:
+                getattr(fresh, op)(*args)
+            self._replay = None
+            for attr in ("_kinds", "_ids", "_names", "_norms", "_pop", "_ref_by_id", "_where", "_tables", "_pending_total"):
+                setattr(self, attr, getattr(fresh, attr))
+            for table in self._tables.values():
+                table._rank = self._rank
+            self.loaded_at = time.monotonic()
+
+    def _build(self, db: Session):
+        product_pop = dict(db.execute(select(Price.productId, func.count()).group_by(Price.productId)).all())
+        market_pop = dict(db.execute(select(Price.marketId, func.count()).group_by(Price.marketId)).all())
+        keys_by_kind: Dict[str, Tuple[array, array]] = {}
+        for kind, stmt, pop in (
+            ("product", select(Product.id, Product.name), product_pop),
+            ("market", select(Market.id, Market.name), market_pop),
+        ):
+            refs, offs = array("i"), array("H")
+            for rows in db.execute(stmt.execution_options(yield_per=5000)).partitions():
+                for item_id, name in rows:
+                    ref, offsets = self._new_entry(kind, item_id, name or "", float(pop.get(item_id, 0)), _MAIN)
+                    for off in offsets:
+                        refs.append(ref)
+                        offs.append(off)
+            keys_by_kind[kind] = (refs, offs)
+
+        ranks = [self._rank(r) for r in range(len(self._names))]
+        norms = self._norms
+        for kind, (refs, offs) in keys_by_kind.items():
+            order = sorted(range(len(refs)), key=lambda k: norms[refs[k]][offs[k]:])
+            table = _KeyTable(array("i", (refs[k] for k in order)), array("H", (offs[k] for k in order)), norms, self._rank)
+            table.build(ranks)
+            self._tables[kind] = table
+
+    # ---------- escrita ----------
+    def _new_entry(self, kind: str, item_id: str, name: str, popularity: float, where: int) -> Tuple[int, List[int]]:
+        norm, offsets = _normalize(name)
+        ref = len(self._names)
+        self._kinds.append(kind)
+        self._ids.append(item_id)
+        self._names.append(name)
+        self._norms.append(norm)
+        self._pop.append(popularity)
+        self._where.append(where)
+        self._ref_by_id[kind][item_id] = ref
+        return ref, offsets
+
+    def _kill(self, ref: int):
+        """Tira o nome das consultas (a ref não é reaproveitada: o array ordenado ainda aponta para ela)."""
+        kind, norm = self._kinds[ref], self._norms[ref]
+        offsets = _normalize(self._names[ref])[1]
+        table = self._tables[kind]
+        if self._where[ref] == _MAIN:
+            table.refresh(ref, norm, offsets, alive=False)
+        else:
+            for off in offsets:
+                i = bisect.bisect_left(table.pending, (norm[off:], ref))
+                if i < len(table.pending) and table.pending[i] == (norm[off:], ref):
+                    del table.pending[i]
+                    self._pending_total -= 1
+        self._where[ref] = _DEAD
+        del self._ref_by_id[kind][self._ids[ref]]
+
+    def upsert(self, kind: str, item_id: str, name: str):
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(("upsert", kind, item_id, name))
+            if not self.loaded:
+                return
+            popularity = 0.0
+            ref = self._ref_by_id[kind].get(item_id)
+            if ref is not None:
+                if self._names[ref] == (name or ""):
+                    return
+                popularity = self._pop[ref]
+                self._kill(ref)
+
+            ref, offsets = self._new_entry(kind, item_id, name or "", popularity, _PENDING)
+            table = self._tables[kind]
+            norm = self._norms[ref]
+            for off in offsets:
+                bisect.insort(table.pending, (norm[off:], ref))
+                self._pending_total += 1
+
+    def add_popularity(self, kind: str, counts: Dict[str, int]):
+        """counts: {id: quantos preços novos} — chamado depois de gravar preços."""
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(("add_popularity", kind, counts))
+            if not self.loaded:
+                return
+            table = self._tables[kind]
+            for item_id, n in counts.items():
+                ref = self._ref_by_id[kind].get(item_id)
+                if ref is None or not n:
+                    continue
+                self._pop[ref] += n
+                if self._where[ref] == _MAIN:
+                    table.refresh(ref, self._norms[ref], _normalize(self._names[ref])[1], alive=True)
+
+    # ---------- consulta ----------
+    def complete(self, query: str, kind: Optional[str] = None, limit: int = 10) -> List[dict]:
+        prefix = " ".join(raw_tokens(query))
+        # mantém o espaço final: "arroz " não deve sugerir "arrozina"
+        if prefix and query[-1:].isspace():
+            prefix += " "
+        if not prefix:
+            return []
+
+        with self._lock:
+            refs: Set[int] = set()
+            for k in ((kind,) if kind else KINDS):
+                table = self._tables.get(k)
+                if table is not None:
+                    refs.update(table.top(prefix, limit))
+            out = []
+            for ref in heapq.nsmallest(limit, refs, key=self._rank):
+                out.append({
+                    "kind": self._kinds[ref],
+                    "id": self._ids[ref],
+                    "name": self._names[ref],
+                    "popularity": int(self._pop[ref]),
+                })
+            return out
+
+
+autocomplete_index = PrefixIndex()
+_reloader = IndexReloader(autocomplete_index, AUTOCOMPLETE_MAX_AGE_SEC, tables=("products", "markets"))
+
+
+def get_autocomplete(db: Session) -> PrefixIndex:
+    """Carrega na primeira chamada; depois recarrega (1 requisição, as outras seguem com o atual)."""
+    return _reloader.get(db)
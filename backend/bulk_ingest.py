@@ -0,0 +1,131 @@
+# bulk_ingest.py
+"""
+Helpers para importação em lote (CSV ou NDJSON) sem carregar o corpo inteiro na memória.
+
+- iter_bulk_records: lê o body do request em streaming e devolve (linha, registro, erro)
+- chunked: agrupa registros em lotes
+- upsert_insert: INSERT ... ON CONFLICT do dialeto certo (Postgres ou SQLite)
+"""
+import csv
+import json
+from typing import AsyncIterator, Iterable, Optional, Tuple
+
+from fastapi import Request
+from sqlalchemy.orm import Session
+
+
+# ✅ lote padrão: cabe folgado no limite de parâmetros do SQLite (IN / VALUES)
+BULK_BATCH_SIZE = 500
+
+# ✅ evita resposta gigante quando o arquivo inteiro vem errado
+BULK_MAX_ERRORS = 1000
+
+
+def detect_bulk_format(request: Request, explicit: Optional[str] = None) -> str:
+    fmt = (explicit or "").strip().lower()
+    if fmt in ("csv", "ndjson"):
+        return fmt
+    content_type = (request.headers.get("content-type") or "").lower()
+    if "csv" in content_type:
+        return "csv"
+    return "ndjson"
+
+
+async def _iter_lines(request: Request) -> AsyncIterator[str]:
+    buf = b""
+    first = True
+    async for chunk in request.stream():
+        if not chunk:
+            continue
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for raw in lines:
+            line = raw.decode("utf-8-sig" if first else "utf-8", errors="replace").rstrip("\r")
+            first = False
+            yield line
+    if buf:
+        yield buf.decode("utf-8-sig" if first else "utf-8", errors="replace").rstrip("\r")
+
+
+async def iter_bulk_records(request: Request, fmt: str) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Gera (numero_da_linha, registro, erro). Quando erro != None, registro é None.
+    No CSV a primeira linha é o cabeçalho (aceita "," ou ";" como separador).
+    """
+    header = None
+    delimiter = ","
+    line_no = 0
+
+    async for line in _iter_lines(request):
+        line_no += 1
+        if not line.strip():
+            continue
+
+        if fmt == "csv":
+            if header is None:
+                if ";" in line and "," not in line:
+                    delimiter = ";"
+                header = [h.strip() for h in next(csv.reader([line], delimiter=delimiter))]
+                continue
+            values = next(csv.reader([line], delimiter=delimiter))
+            if len(values) != len(header):
+                yield line_no, None, "número de colunas diferente do cabeçalho"
+                continue
+            yield line_no, dict(zip(header, [v.strip() for v in values])), None
+            continue
+
+        try:
+            obj = json.loads(line)
+        except Exception:
+            yield line_no, None, "JSON inválido"
+            continue
+        if not isinstance(obj, dict):
+            yield line_no, None, "cada linha deve ser um objeto JSON"
+            continue
+        yield line_no, obj, None
+
+
+def parse_price_value(value) -> Optional[float]:
+    # aceita 12.90, "12.90" e "12,90" (CSV brasileiro)
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        v = float(value)
+    else:
+        s = str(value).strip()
+        if "," in s and "." not in s:
+            s = s.replace(",", ".")
+        try:
+            v = float(s)
+        except ValueError:
+            return None
+    if v != v or v in (float("inf"), float("-inf")) or v < 0:
+        return None
+    return v
+
+
+def clean_str(value) -> Optional[str]:
+    if value is None:
+        return None
+    s = str(value).strip()
+    return s or None
+
+
+def chunked(items: list, size: int = BULK_BATCH_SIZE) -> Iterable[list]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def upsert_insert(db: Session, model):
+    """
+    Devolve o insert() do dialeto em uso, que tem on_conflict_do_update/do_nothing.
+    Postgres e SQLite suportam INSERT ... ON CONFLICT.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"upsert em lote não suportado para o banco '{dialect}'")
+    return insert(model)
@@ -0,0 +1,74 @@
+# catalog_hooks.py
+"""
+Pontos únicos chamados pelas rotas DEPOIS do commit de produtos, mercados e preços.
+Mantém os índices em memória (matriz de preços, estatísticas, geo, busca, autocomplete, alertas, SSE, snapshot) em dia
+sem cada rota precisar conhecer todos eles.
+
+Também monta o ETag das listas do catálogo (products / markets) a partir da versão da
+tabela no banco (sync_log.table_version), e invalida as chaves exatas do cache de
+respostas (response_cache).
+"""
+from collections import Counter
+from typing import Iterable, List, Optional
+
+from models import Market
+from price_matrix import apply_price_changes
+from geo_index import geo_index
+from search_index import product_search
+from autocomplete import autocomplete_index
+from alerts_engine import evaluate_price_changes
+from price_stream import price_hub
+from response_cache import price_keys, response_cache
+from catalog_snapshot import snapshot_worker
+from price_stats import price_stats
+
+
+# ✅ NOVO: ETag forte das listas = maior changeSeq da tabela. Vem do banco (não de um
+# contador do processo): escrita feita em qualquer worker muda o ETag em todos.
+def catalog_etag(table: str, version: int) -> str:
+    """version: sync_log.table_version(db, table) — a mesma versão chaveia o response_cache."""
+    return f'"{table}-{version}"'
+
+
+def market_saved(m: Market, previous_business_id: Optional[str] = None):
+    """previous_business_id: businessId antes da edição, se a rota deixou trocar."""
+    response_cache.invalidate({
+        ("markets", None),
+        ("markets", m.businessId),
+        ("markets", previous_business_id),
+    })
+    geo_index.upsert_market(m)
+    autocomplete_index.upsert("market", m.id, m.name or "")
+    price_stats.market_changed(m.id, m.city, m.state)
+    snapshot_worker.mark_dirty()
+
+
+def products_saved(rows: Iterable[dict]):
+    """rows: [{"id", "name", "unit"}]"""
+    rows = list(rows)
+    if not rows:
+        return
+    response_cache.invalidate([("products",)])
+    product_search.upsert_many(rows)
+    for r in rows:
+        autocomplete_index.upsert("product", r["id"], r["name"] or "")
+    snapshot_worker.mark_dirty()
+
+
+def prices_saved(rows: List[dict]):
+    """rows: [{"marketId", "productId", "price", "oldPrice"?}] — só preços novos ou que mudaram"""
+    if not rows:
+        return
+    response_cache.invalidate(price_keys(rows))
+    apply_price_changes(rows)
+    new_rows = [r for r in rows if r.get("oldPrice") is None]
+    autocomplete_index.add_popularity("product", Counter(r["productId"] for r in new_rows))
+    autocomplete_index.add_popularity("market", Counter(r["marketId"] for r in new_rows))
+    price_stats.apply(rows)
+    price_hub.publish(rows)
+    snapshot_worker.mark_dirty()
+    try:
+        evaluate_price_changes(rows)
+    except Exception as e:
+        # alerta nunca pode derrubar a gravação de preço (que já foi commitada)
+        print("ALERTS_EVALUATE_ERROR:", repr(e))
@@ -0,0 +1,169 @@
+# catalog_snapshot.py
+"""
+Snapshot pré-computado do catálogo (products + markets + prices atuais) em JSON gzip no disco.
+
+- versão = valor do contador do delta sync (sync_log.current_seq): só muda quando algum
+  produto/mercado/preço muda, e o cliente pode continuar com GET /api/sync?since=<versão>
+- uma thread em background regenera quando os dados mudam: os hooks de escrita acordam a
+  thread (mark_dirty) e ela também confere o contador a cada CATALOG_SNAPSHOT_POLL_SEC
+  (pega escritas feitas por outros workers)
+- escrita em streaming (yield_per + gzip), arquivo temporário + os.replace: quem está
+  servindo nunca vê arquivo pela metade
+- arquivos são imutáveis (catalog-<versão>.json.gz): dá para servir com cache longo / CDN
+"""
+import gzip
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import orjson
+from sqlalchemy import select
+
+from db import SessionLocal
+from models import Price, Product, MARKET_COLUMNS
+from sync_log import current_seq
+
+
+CATALOG_SNAPSHOT_DIR = Path(os.getenv("CATALOG_SNAPSHOT_DIR") or (Path(__file__).resolve().parent / "snapshots"))
+CATALOG_SNAPSHOT_KEEP = int(os.getenv("CATALOG_SNAPSHOT_KEEP", "3"))
+CATALOG_SNAPSHOT_POLL_SEC = float(os.getenv("CATALOG_SNAPSHOT_POLL_SEC", "60"))
+# espera depois de uma escrita para juntar rajadas (importação em lote) num snapshot só
+CATALOG_SNAPSHOT_DEBOUNCE_SEC = float(os.getenv("CATALOG_SNAPSHOT_DEBOUNCE_SEC", "5"))
+CATALOG_SNAPSHOT_CHUNK = 5000
+
+_FILE_RE = re.compile(r"^catalog-(\d+)\.json\.gz$")
+
+_SECTIONS = (
+    ("products", (Product.id, Product.name, Product.unit)),
+    ("markets", MARKET_COLUMNS),
+    ("prices", (Price.id, Price.marketId, Price.productId, Price.price)),
+)
+
+
+def snapshot_path(version: int) -> Path:
+    return CATALOG_SNAPSHOT_DIR / f"catalog-{int(version)}.json.gz"
+
+
+def latest_snapshot() -> Optional[dict]:
+    """{version, path, bytes, generatedAt} do snapshot mais novo no disco (ou None)."""
+    try:
+        names = os.listdir(CATALOG_SNAPSHOT_DIR)
+    except FileNotFoundError:
+        return None
+    versions = [int(m.group(1)) for m in map(_FILE_RE.match, names) if m]
+    if not versions:
+        return None
+    path = snapshot_path(max(versions))
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return {
+        "version": max(versions),
+        "path": path,
+        "bytes": st.st_size,
+        "generatedAt": datetime.fromtimestamp(st.st_mtime, timezone.utc).isoformat(),
+    }
+
+
+def _write_snapshot(db, version: int, path: Path):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with gzip.open(tmp, "wb", compresslevel=6) as out:
+            out.write(b'{"version":%d,"generatedAt":%s' % (
+                version, orjson.dumps(datetime.now(timezone.utc).isoformat())
+            ))
+            for name, cols in _SECTIONS:
+                keys = [c.key for c in cols]
+                out.write(b',"%s":[' % name.encode())
+                first = True
+                result = db.execute(select(*cols).order_by(cols[0]).execution_options(yield_per=CATALOG_SNAPSHOT_CHUNK))
+                for rows in result.partitions():
+                    chunk = b",".join(orjson.dumps(dict(zip(keys, r))) for r in rows)
+                    if not first:
+                        out.write(b",")
+                    out.write(chunk)
+                    first = False
+                out.write(b"]")
+            out.write(b"}")
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def _prune():
+    # mantém os N mais novos: quem ainda está baixando (ou o CDN revalidando) a versão
+    # anterior não toma 404 logo depois de uma escrita
+    versions = sorted(
+        (int(m.group(1)) for m in map(_FILE_RE.match, os.listdir(CATALOG_SNAPSHOT_DIR)) if m),
+        reverse=True,
+    )
+    for v in versions[max(1, CATALOG_SNAPSHOT_KEEP):]:
+        try:
+            snapshot_path(v).unlink()
+        except FileNotFoundError:
+            pass
+
+
+_build_lock = threading.Lock()
+
+
+def build_if_changed() -> Optional[dict]:
+    """Gera o snapshot da versão atual se ainda não existe. Devolve o mais novo."""
+    with _build_lock:
+        db = SessionLocal()
+        try:
+            # versão lida ANTES das linhas: o arquivo tem tudo até ela (talvez um pouco mais,
+            # que o /api/sync?since=<versão> repete sem problema)
+            version = current_seq(db)
+            path = snapshot_path(version)
+            if not path.exists():
+                CATALOG_SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+                started = time.perf_counter()
+                _write_snapshot(db, version, path)
+                print(
+                    "CATALOG_SNAPSHOT: version", version,
+                    "bytes", path.stat().st_size,
+                    "ms", round((time.perf_counter() - started) * 1000, 1),
+                )
+                _prune()
+        finally:
+            db.close()
+    return latest_snapshot()
+
+
+class SnapshotWorker:
+    def __init__(self):
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name="catalog-snapshot", daemon=True)
+            self._thread.start()
+        self._wake.set()
+
+    def mark_dirty(self):
+        self._wake.set()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(timeout=CATALOG_SNAPSHOT_POLL_SEC)
+            if self._wake.is_set():
+                time.sleep(CATALOG_SNAPSHOT_DEBOUNCE_SEC)
+                self._wake.clear()
+            try:
+                build_if_changed()
+            except Exception as e:
+                print("CATALOG_SNAPSHOT_ERROR:", repr(e))
+
+
+snapshot_worker = SnapshotWorker()
@@ -0,0 +1,245 @@
+# email_outbox.py
+"""
+Outbox de e-mail: a rota só grava o e-mail na tabela (email_outbox) e volta na hora;
+uma thread em background envia.
+
+- durável: o e-mail está no banco antes da rota responder (reinício não perde nada)
+- a rota acorda o worker (mesmo processo); além disso ele confere a tabela a cada
+  EMAIL_OUTBOX_POLL_SEC (retentativas agendadas / e-mails de outros workers)
+- pega até EMAIL_OUTBOX_BATCH por vez com UPDATE ... RETURNING: o nextAttemptAt vira
+  um "lease", então dois processos não mandam o mesmo e-mail
+- 1 conexão SMTP autenticada reaproveitada entre envios (STARTTLS + login só na conexão);
+  fecha depois de EMAIL_SMTP_IDLE_SEC sem uso
+- erro temporário (conexão, 4xx) -> backoff exponencial até EMAIL_OUTBOX_MAX_ATTEMPTS;
+  recusa definitiva (5xx) -> failed
+
+Configuração SMTP por env (SMTP_HOST / SMTP_PORT / SMTP_USER / SMTP_PASS / SMTP_FROM /
+SMTP_TLS), lida a cada conexão. Sem SMTP_USER/SMTP_PASS não faz login (relay local,
+aiosmtpd em teste).
+"""
+import os
+import random
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from typing import Optional
+
+from sqlalchemy import select, update
+
+from db import SessionLocal
+from models import EmailOutbox
+
+
+EMAIL_OUTBOX_BATCH = int(os.getenv("EMAIL_OUTBOX_BATCH", "50"))
+EMAIL_OUTBOX_POLL_SEC = float(os.getenv("EMAIL_OUTBOX_POLL_SEC", "15"))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "6"))
+EMAIL_OUTBOX_RETRY_BASE_SEC = float(os.getenv("EMAIL_OUTBOX_RETRY_BASE_SEC", "30"))
+EMAIL_OUTBOX_RETRY_MAX_SEC = float(os.getenv("EMAIL_OUTBOX_RETRY_MAX_SEC", str(60 * 60)))
+# tempo que um lote fica "reservado" para o worker que pegou (se ele morrer, outro pega depois)
+EMAIL_OUTBOX_LEASE_SEC = 120
+EMAIL_SMTP_IDLE_SEC = float(os.getenv("EMAIL_SMTP_IDLE_SEC", "60"))
+EMAIL_SMTP_TIMEOUT_SEC = 20
+
+
+def _now_utc() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _smtp_settings() -> dict:
+    user = (os.getenv("SMTP_USER") or "").strip()
+    return {
+        "host": (os.getenv("SMTP_HOST") or "").strip(),
+        "port": int((os.getenv("SMTP_PORT") or "587").strip() or "587"),
+        "user": user,
+        "password": (os.getenv("SMTP_PASS") or "").strip(),
+        "from": (os.getenv("SMTP_FROM") or user or "no-reply@compareeconomize.com").strip(),
+        "tls": (os.getenv("SMTP_TLS") or "1").strip() != "0",
+    }
+
+
+def smtp_configured() -> bool:
+    return bool(_smtp_settings()["host"])
+
+
+def queue_email(to_email: str, subject: str, body: str) -> int:
+    """Grava o e-mail na outbox (commit próprio) e acorda o worker. Devolve o id."""
+    db = SessionLocal()
+    try:
+        row = EmailOutbox(toEmail=to_email, subject=subject, body=body, nextAttemptAt=_now_utc())
+        db.add(row)
+        db.commit()
+        email_id = row.id
+    finally:
+        db.close()
+    email_worker.wake()
+    return email_id
+
+
+def _retry_delay(attempts: int) -> float:
+    delay = min(EMAIL_OUTBOX_RETRY_MAX_SEC, EMAIL_OUTBOX_RETRY_BASE_SEC * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _is_permanent(e: Exception) -> bool:
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in e.recipients.values())
+    if isinstance(e, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return False
+    if isinstance(e, smtplib.SMTPResponseException):
+        return e.smtp_code >= 500
+    return False
+
+
+_REFUSED = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+class EmailWorker:
+    def __init__(self):
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._smtp_used_at = 0.0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name="email-outbox", daemon=True)
+            self._thread.start()
+        self._wake.set()
+
+    def wake(self):
+        self._wake.set()
+
+    # ---------- conexão SMTP ----------
+    def _connect(self) -> smtplib.SMTP:
+        cfg = _smtp_settings()
+        server = smtplib.SMTP(cfg["host"], cfg["port"], timeout=EMAIL_SMTP_TIMEOUT_SEC)
+        try:
+            if cfg["tls"]:
+                server.starttls()
+            if cfg["user"] and cfg["password"]:
+                server.login(cfg["user"], cfg["password"])
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def _close(self):
+        server, self._smtp = self._smtp, None
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                server.close()
+
+    def _send(self, msg: EmailMessage):
+        if self._smtp is None:
+            self._smtp = self._connect()
+        try:
+            self._smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # servidor derrubou a conexão parada: reconecta e tenta de novo uma vez
+            self._close()
+            self._smtp = self._connect()
+            self._smtp.send_message(msg)
+        self._smtp_used_at = time.monotonic()
+
+    # ---------- lote ----------
+    def _claim(self, db) -> list:
+        now = _now_utc()
+        due = (
+            select(EmailOutbox.id)
+            .where(EmailOutbox.status == "pending", EmailOutbox.nextAttemptAt <= now)
+            .order_by(EmailOutbox.nextAttemptAt)
+            .limit(EMAIL_OUTBOX_BATCH)
+        )
+        rows = db.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(due), EmailOutbox.status == "pending", EmailOutbox.nextAttemptAt <= now)
+            .values(nextAttemptAt=now + timedelta(seconds=EMAIL_OUTBOX_LEASE_SEC), attempts=EmailOutbox.attempts + 1)
+            .returning(EmailOutbox.id, EmailOutbox.toEmail, EmailOutbox.subject, EmailOutbox.body, EmailOutbox.attempts)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.commit()
+        return rows
+
+    def process_batch(self) -> int:
+        """Envia um lote de e-mails vencidos. Devolve quantos pegou da fila."""
+        db = SessionLocal()
+        try:
+            rows = self._claim(db)
+            if not rows:
+                return 0
+
+            sender = _smtp_settings()["from"]
+            results = []
+            for i, (email_id, to_email, subject, body, attempts) in enumerate(rows):
+                msg = EmailMessage()
+                msg["Subject"] = subject
+                msg["From"] = sender
+                msg["To"] = to_email
+                msg.set_content(body)
+                try:
+                    self._send(msg)
+                    results.append({"id": email_id, "status": "sent", "sentAt": _now_utc(), "lastError": None})
+                    self.sent += 1
+                except Exception as e:
+                    # recusa do servidor mantém a sessão SMTP válida (smtplib faz RSET); o resto reconecta
+                    if not isinstance(e, _REFUSED):
+                        self._close()
+                    print("EMAIL_SEND_ERROR:", email_id, repr(e))
+                    if _is_permanent(e) or attempts >= EMAIL_OUTBOX_MAX_ATTEMPTS:
+                        results.append({"id": email_id, "status": "failed", "lastError": repr(e)[:500]})
+                        self.failed += 1
+                    else:
+                        results.append({
+                            "id": email_id,
+                            "lastError": repr(e)[:500],
+                            "nextAttemptAt": _now_utc() + timedelta(seconds=_retry_delay(attempts)),
+                        })
+                        self.retried += 1
+                    if isinstance(e, smtplib.SMTPConnectError) or (
+                        isinstance(e, OSError) and not isinstance(e, smtplib.SMTPException)
+                    ):
+                        # servidor fora do ar: o resto do lote volta para a fila com o mesmo backoff
+                        for rest_id, _, _, _, rest_attempts in rows[i + 1:]:
+                            results.append({
+                                "id": rest_id,
+                                "lastError": repr(e)[:500],
+                                "nextAttemptAt": _now_utc() + timedelta(seconds=_retry_delay(rest_attempts)),
+                            })
+                            self.retried += 1
+                        break
+
+            # UPDATE em lote por chave primária (1 executemany por formato de linha)
+            for keys in {tuple(sorted(r)) for r in results}:
+                db.execute(update(EmailOutbox), [r for r in results if tuple(sorted(r)) == keys])
+            db.commit()
+            return len(rows)
+        finally:
+            db.close()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(timeout=EMAIL_OUTBOX_POLL_SEC)
+            self._wake.clear()
+            try:
+                while self.process_batch() >= EMAIL_OUTBOX_BATCH:
+                    pass
+            except Exception as e:
+                print("EMAIL_OUTBOX_ERROR:", repr(e))
+            if self._smtp is not None and time.monotonic() - self._smtp_used_at > EMAIL_SMTP_IDLE_SEC:
+                self._close()
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "retried": self.retried, "failed": self.failed, "connected": self._smtp is not None}
+
+
+email_worker = EmailWorker()
@@ -0,0 +1,27 @@
+# fast_json.py
+"""
+Caminho rápido de serialização para listas grandes.
+
+Em vez de ORM -> response_model (Pydantic revalida) -> jsonable_encoder -> json da stdlib:
+- a rota seleciona só as colunas (tuplas, sem montar objeto ORM)
+- as tuplas viram bytes direto com orjson (dados do banco já são confiáveis, não revalida)
+
+Opt-in: a rota devolve o Response daqui; rotas que não usam continuam iguais.
+"""
+from typing import Iterable, Optional, Sequence
+
+import orjson
+from fastapi.responses import Response
+
+
+def rows_json(keys: Sequence[str], rows: Iterable[Sequence]) -> bytes:
+    """Lista de tuplas (na ordem de `keys`) -> JSON array de objetos."""
+    return orjson.dumps([dict(zip(keys, r)) for r in rows])
+
+
+def json_bytes_response(data: bytes, headers: Optional[dict] = None, status_code: int = 200) -> Response:
+    return Response(content=data, media_type="application/json", headers=headers, status_code=status_code)
+
+
+def rows_response(keys: Sequence[str], rows: Iterable[Sequence], headers: Optional[dict] = None) -> Response:
+    return json_bytes_response(rows_json(keys, rows), headers=headers)
@@ -0,0 +1,181 @@
+# geo_index.py
+"""
+Índice espacial em memória dos mercados (grade lat/lng, estilo geohash).
+
+- cada mercado com latitude/longitude cai numa célula de GEO_CELL_DEG graus
+- nearby() olha só as células que cobrem o raio e filtra por haversine
+- guarda o mercado já serializado, então a busca não precisa ir no banco
+
+As rotas que criam/editam mercado (data.py, markets.py, business.py) chamam
+geo_index.upsert_market() depois do commit. Mercados gravados em OUTROS workers entram na
+recarga (index_reload.IndexReloader: quando a tabela markets muda no banco), montada fora
+do lock e trocada de uma vez.
+"""
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from index_reload import IndexReloader
+from models import Market, MARKET_FIELDS
+
+
+# 0.05° ≈ 5,5 km de latitude: raio típico (1-10 km) cobre poucas células
+GEO_CELL_DEG = 0.05
+EARTH_RADIUS_KM = 6371.0088
+_KM_PER_DEG_LAT = 111.32
+GEO_MAX_AGE_SEC = int(os.getenv("GEO_MAX_AGE_SEC", "3600"))
+
+
+def haversine_km(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def bounding_box(lat: float, lng: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lng, max_lng) que cobre o raio (filtro grosso antes do haversine)."""
+    dlat = radius_km / _KM_PER_DEG_LAT
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    dlng = min(radius_km / (_KM_PER_DEG_LAT * cos_lat), 180.0)
+    return lat - dlat, lat + dlat, lng - dlng, lng + dlng
+
+
+def market_payload(m: Market) -> dict:
+    return {f: getattr(m, f) for f in MARKET_FIELDS}
+
+
+def _cell(lat: float, lng: float) -> Tuple[int, int]:
+    return int(math.floor(lat / GEO_CELL_DEG)), int(math.floor(lng / GEO_CELL_DEG))
+
+
+class GeoIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded_at: Optional[float] = None
+        self._replay: Optional[List[tuple]] = None
+        self._reset()
+
+    def _reset(self):
+        # célula -> {market_id: (lat, lng)}
+        self._cells: Dict[Tuple[int, int], Dict[str, Tuple[float, float]]] = {}
+        # market_id -> (célula, payload)
+        self._markets: Dict[str, Tuple[Tuple[int, int], dict]] = {}
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def __len__(self):
+        return len(self._markets)
+
+    def load(self, db: Session):
+        """Monta o índice novo fora do lock e troca de uma vez: buscas nunca esperam o scan."""
+        stmt = select(Market).where(Market.latitude.is_not(None), Market.longitude.is_not(None))
+        with self._lock:
+            # escritas commitadas durante o scan podem não aparecer nele: guarda para reaplicar
+            self._replay = []
+        fresh = GeoIndex()
+        try:
+            for m in db.scalars(stmt.execution_options(yield_per=2000)):
+                fresh._put(m.id, m.latitude, m.longitude, market_payload(m))
+        except BaseException:
+            with self._lock:
+                self._replay = None
+            raise
+        with self._lock:
+            for market_id, payload in self._replay:
+                fresh._apply(market_id, payload)
+            self._replay = None
+            self._cells, self._markets = fresh._cells, fresh._markets
+            self.loaded_at = time.monotonic()
+
+    def _put(self, market_id: str, lat: float, lng: float, payload: dict):
+        self._remove(market_id)
+        cell = _cell(lat, lng)
+        self._cells.setdefault(cell, {})[market_id] = (float(lat), float(lng))
+        self._markets[market_id] = (cell, payload)
+
+    def _remove(self, market_id: str):
+        old = self._markets.pop(market_id, None)
+        if old is None:
+            return
+        bucket = self._cells.get(old[0])
+        if bucket is not None:
+            bucket.pop(market_id, None)
+            if not bucket:
+                del self._cells[old[0]]
+
+    def _apply(self, market_id: str, payload: Optional[dict]):
+        # payload None (ou sem coordenadas) = tira o mercado do índice
+        if payload is None or payload["latitude"] is None or payload["longitude"] is None:
+            self._remove(market_id)
+        else:
+            self._put(market_id, payload["latitude"], payload["longitude"], payload)
+
+    def _write(self, market_id: str, payload: Optional[dict]):
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((market_id, payload))
+            if self.loaded:
+                self._apply(market_id, payload)
+
+    def upsert_market(self, m: Market):
+        self._write(m.id, market_payload(m))
+
+    def remove_market(self, market_id: str):
+        self._write(market_id, None)
+
+    def nearby_ids(self, lat: float, lng: float, radius_km: float, category: Optional[str] = None) -> Tuple[List[str], np.ndarray]:
+        """(ids, distâncias em km) dentro do raio, ordenados do mais perto ao mais longe."""
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+        c_lat0, c_lng0 = _cell(min_lat, min_lng)
+        c_lat1, c_lng1 = _cell(max_lat, max_lng)
+
+        ids, lats, lngs = [], [], []
+        with self._lock:
+            for ci in range(c_lat0, c_lat1 + 1):
+                for cj in range(c_lng0, c_lng1 + 1):
+                    bucket = self._cells.get((ci, cj))
+                    if not bucket:
+                        continue
+                    for market_id, (mlat, mlng) in bucket.items():
+                        if category and self._markets[market_id][1].get("categorySlug") != category:
+                            continue
+                        ids.append(market_id)
+                        lats.append(mlat)
+                        lngs.append(mlng)
+
+        if not ids:
+            return [], np.empty(0)
+
+        dist = haversine_km(lat, lng, np.array(lats), np.array(lngs))
+        keep = np.flatnonzero(dist <= radius_km)
+        keep = keep[np.argsort(dist[keep], kind="stable")]
+        return [ids[i] for i in keep], dist[keep]
+
+    def nearby(self, lat: float, lng: float, radius_km: float, category: Optional[str] = None, limit: int = 50) -> List[dict]:
+        ids, dist = self.nearby_ids(lat, lng, radius_km, category)
+        out = []
+        with self._lock:
+            for market_id, d in zip(ids[:limit], dist[:limit]):
+                entry = self._markets.get(market_id)
+                if entry is None:
+                    continue
+                out.append({**entry[1], "distanceKm": round(float(d), 3)})
+        return out
+
+
+geo_index = GeoIndex()
+_reloader = IndexReloader(geo_index, GEO_MAX_AGE_SEC, tables=("markets",))
+
+
+def get_geo_index(db: Session) -> GeoIndex:
+    """Carrega na primeira chamada; recarrega quando markets muda (1 requisição, as outras seguem)."""
+    return _reloader.get(db)
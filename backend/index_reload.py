@@ -0,0 +1,71 @@
+# index_reload.py
+"""
+Carga e recarga dos índices em memória (autocomplete, busca, geo, estatísticas).
+
+Cada worker tem a sua cópia e os catalog_hooks só atualizam o worker que recebeu a
+escrita. Para as escritas dos OUTROS workers aparecerem, o índice é recarregado quando:
+- as tabelas de que ele depende mudaram no banco (sync_log.table_version, conferido no
+  máximo a cada INDEX_VERSION_CHECK_SEC), ou
+- passou de max_age_sec desde a última carga (dados sem versão própria, ex.: preços), ou
+- o próprio índice pede (index.is_stale(), ex.: lista lateral grande demais)
+
+A 1ª carga bloqueia (não há o que servir). Nas recargas, UMA requisição reconstrói (o
+índice monta a cópia nova fora do lock e troca no fim) e as outras seguem com o atual.
+O índice precisa de: loaded_at (None = nunca carregado) e load(db).
+"""
+import os
+import threading
+import time
+from typing import Dict, Sequence
+
+from sqlalchemy.orm import Session
+
+from sync_log import table_version
+
+
+INDEX_VERSION_CHECK_SEC = float(os.getenv("INDEX_VERSION_CHECK_SEC", "15"))
+
+
+class IndexReloader:
+    def __init__(self, index, max_age_sec: int = 0, tables: Sequence[str] = ()):
+        self.index = index
+        self.max_age_sec = max_age_sec
+        self.tables = tuple(tables)
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._checked_at = 0.0
+
+    def _current_versions(self, db: Session) -> Dict[str, int]:
+        return {t: table_version(db, t) for t in self.tables}
+
+    def _is_stale(self, db: Session) -> bool:
+        loaded_at = self.index.loaded_at
+        if self.max_age_sec > 0 and time.monotonic() - loaded_at > self.max_age_sec:
+            return True
+        is_stale = getattr(self.index, "is_stale", None)
+        if is_stale is not None and is_stale():
+            return True
+        if self.tables and time.monotonic() - self._checked_at > INDEX_VERSION_CHECK_SEC:
+            self._checked_at = time.monotonic()
+            return self._current_versions(db) != self._versions
+        return False
+
+    def _load(self, db: Session):
+        # versões lidas ANTES da carga: escrita no meio dela dispara outra recarga depois
+        versions = self._current_versions(db)
+        self.index.load(db)
+        self._versions = versions
+        self._checked_at = time.monotonic()
+
+    def get(self, db: Session):
+        index = self.index
+        if index.loaded_at is None:
+            with self._lock:
+                if index.loaded_at is None:
+                    self._load(db)
+        elif self._is_stale(db) and self._lock.acquire(blocking=False):
+            try:
+                self._load(db)
+            finally:
+                self._lock.release()
+        return index
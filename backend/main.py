@@ -20,6 +20,11 @@ from routes.business import router as business_router
 from routes.markets import router as markets_router
 from routes.stats import router as stats_router
 from routes.routes_billing import router as billing_router
+from routes.compare import router as compare_router
+from routes.history import router as history_router
+from routes.alerts import router as alerts_router
+from routes.sync import router as sync_router
+from routes.catalog import router as catalog_router
 
 from db import Base, engine
 from routes.data import router as data_router
@@ -119,6 +124,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # ✅ NOVO: front precisa ler o cursor da próxima página (GET /api/prices?limit=)
+    # e o ETag das listas do catálogo (GET /api/products, /api/markets)
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # ✅ AJUSTE: cria tabelas no startup (evita rodar em import/reload)
@@ -149,10 +157,45 @@ def on_startup():
     # mas manter isso aqui não quebra (desde que engine aponte pro Postgres certo).
     Base.metadata.create_all(bind=engine)
 
+    # ✅ NOVO: thread que regenera o snapshot do catálogo quando os dados mudam
+    try:
+        from catalog_snapshot import snapshot_worker
+        snapshot_worker.start()
+    except Exception as e:
+        print("WARN: failed starting catalog snapshot worker:", repr(e))
+
+    # ✅ NOVO: limpeza periódica das sessões vencidas (auth_sessions)
+    try:
+        from auth_sessions import session_sweeper
+        session_sweeper.start()
+    except Exception as e:
+        print("WARN: failed starting auth session sweeper:", repr(e))
+
+    # ✅ NOVO: envio dos e-mails da outbox (email_outbox)
+    try:
+        from email_outbox import email_worker
+        email_worker.start()
+    except Exception as e:
+        print("WARN: failed starting email outbox worker:", repr(e))
+
+@app.on_event("shutdown")
+def on_shutdown():
+    # ✅ NOVO: encerra os processos do pool de hash de senha
+    from password_hashing import password_pool
+    password_pool.shutdown()
+
+
 @app.get("/api/health")
 def health():
     return {"status": "ok"}
 
+
+# ✅ NOVO: fila / latência do pool de hash de senha (login / cadastro)
+@app.get("/api/health/password-pool")
+def health_password_pool():
+    from password_hashing import password_pool
+    return password_pool.stats()
+
 # ==========================
 # ROTAS DA APLICAÇÃO
 # ==========================
@@ -175,6 +218,11 @@ app.include_router(business_router, prefix="/api")
 app.include_router(markets_router, prefix="/api")
 app.include_router(stats_router, prefix="/api")
 app.include_router(me_alias_router, prefix="/api")
+app.include_router(compare_router, prefix="/api")
+app.include_router(history_router, prefix="/api")
+app.include_router(alerts_router, prefix="/api")
+app.include_router(sync_router, prefix="/api")
+app.include_router(catalog_router, prefix="/api")
 
 # ✅ Billing já tem prefix "/api/billing" dentro do router, então NÃO coloca prefix aqui
 app.include_router(billing_router)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, Integer, ForeignKey, UniqueConstraint, Boolean, DateTime
+from sqlalchemy import Column, String, Float, Integer, BigInteger, ForeignKey, UniqueConstraint, Boolean, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from db import Base
@@ -70,11 +70,13 @@ class AuthSession(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     userId = Column(String, ForeignKey("users.id"), index=True, nullable=False)
 
-    token = Column(String, unique=True, index=True, nullable=False)
+    # ✅ NOVO: SHA-256 do token (auth_sessions.hash_session_token), nunca o token em si
+    tokenHash = Column(String, unique=True, index=True, nullable=False)
 
     provider = Column(String, nullable=True, default="google")
     createdAt = Column(DateTime(timezone=True), server_default=func.now())
-    expiresAt = Column(DateTime(timezone=True), nullable=True)
+    # ✅ NOVO: sempre preenchido (auth_sessions.new_auth_session); índice p/ o sweeper
+    expiresAt = Column(DateTime(timezone=True), nullable=True, index=True)
 
     user = relationship("User")
 
@@ -168,6 +170,9 @@ class Product(Base):
     name = Column(String, nullable=False, index=True)
     unit = Column(String, nullable=True)
 
+    # ✅ NOVO: sequência global de mudança (delta sync: GET /api/sync?since=)
+    changeSeq = Column(BigInteger().with_variant(Integer, "sqlite"), index=True, nullable=True)
+
 
 class Market(Base):
     __tablename__ = "markets"
@@ -189,9 +194,21 @@ class Market(Base):
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
 
+    # ✅ NOVO: sequência global de mudança (delta sync: GET /api/sync?since=)
+    changeSeq = Column(BigInteger().with_variant(Integer, "sqlite"), index=True, nullable=True)
+
     business = relationship("Business", back_populates="markets")
 
 
+# ✅ NOVO: campos públicos do mercado, definidos UMA vez. As listas selecionam só essas
+# colunas (tuplas) e serializam com orjson (fast_json); serialize_market usa os mesmos campos.
+MARKET_FIELDS = (
+    "id", "businessId", "name", "categorySlug", "addressLine", "city", "state", "zipCode",
+    "phone", "email", "cnpj", "inscricaoEstadual", "latitude", "longitude",
+)
+MARKET_COLUMNS = tuple(getattr(Market, f) for f in MARKET_FIELDS)
+
+
 class Price(Base):
     __tablename__ = "prices"
 
@@ -200,9 +217,108 @@ class Price(Base):
     productId = Column(String, ForeignKey("products.id"), nullable=False, index=True)
     price = Column(Float, nullable=False)
 
+    # ✅ NOVO: sequência global de mudança (delta sync: GET /api/sync?since=)
+    changeSeq = Column(BigInteger().with_variant(Integer, "sqlite"), index=True, nullable=True)
+
     __table_args__ = (
         UniqueConstraint("marketId", "productId", name="uq_price_market_product"),
+        # ✅ NOVO: "onde está mais barato" (productId = ?, ORDER BY price) sem ordenar na mão
+        Index("ix_prices_productId_price", "productId", "price"),
     )
 
     market = relationship("Market")
     product = relationship("Product")
+
+
+# =========================
+# HISTÓRICO DE PREÇOS (append-only)
+# =========================
+# ✅ NOVO: 1 linha por mudança de preço.
+# Compacto: priceId (int, já identifica o par mercado+produto), centavos em int e timestamp.
+class PriceHistory(Base):
+    __tablename__ = "price_history"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    priceId = Column(Integer, ForeignKey("prices.id"), nullable=False)
+    priceCents = Column(Integer, nullable=False)
+    recordedAt = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_price_history_priceId_recordedAt", "priceId", "recordedAt"),
+    )
+
+
+# =========================
+# ALERTAS DE PREÇO
+# =========================
+# ✅ NOVO: alerta dispara quando algum mercado (ou o mercado escolhido) fica com preço <= targetPrice.
+# Dono: userId (logado) ou sessionId (visitante, igual o front já manda).
+class PriceAlert(Base):
+    __tablename__ = "price_alerts"
+    __table_args__ = (
+        # ✅ NOVO: "alvos cruzados" = productId = ? AND targetPrice >= novo AND < antigo (busca por intervalo)
+        Index("ix_price_alerts_productId_targetPrice", "productId", "targetPrice"),
+    )
+
+    id = Column(String, primary_key=True, index=True, default=gen_uuid)
+    userId = Column(String, ForeignKey("users.id"), index=True, nullable=True)
+    sessionId = Column(String, index=True, nullable=True)
+
+    productId = Column(String, ForeignKey("products.id"), index=True, nullable=False)
+    marketId = Column(String, ForeignKey("markets.id"), nullable=True)
+    targetPrice = Column(Float, nullable=False)
+
+    isActive = Column(Boolean, nullable=False, default=True)
+    createdAt = Column(DateTime(timezone=True), server_default=func.now())
+    triggeredAt = Column(DateTime(timezone=True), nullable=True)
+    triggeredPrice = Column(Float, nullable=True)
+    triggeredMarketId = Column(String, nullable=True)
+
+
+# =========================
+# DELTA SYNC
+# =========================
+# ✅ NOVO: contador único da sequência de mudança (1 linha, id=1).
+# UPDATE ... RETURNING trava a linha até o commit: a ordem dos números = ordem dos commits,
+# então um cliente que leu até N nunca perde uma linha que commitou depois com número < N.
+class SyncCounter(Base):
+    __tablename__ = "sync_counter"
+
+    id = Column(Integer, primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+
+# ✅ NOVO: tombstones de products / markets / prices apagados
+class SyncTombstone(Base):
+    __tablename__ = "sync_tombstones"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    entity = Column(String, nullable=False)  # "products" | "markets" | "prices"
+    entityId = Column(String, nullable=False)
+    changeSeq = Column(BigInteger().with_variant(Integer, "sqlite"), nullable=False, index=True)
+    deletedAt = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# =========================
+# EMAIL OUTBOX
+# =========================
+# ✅ NOVO: fila persistida de e-mails (email_outbox.py envia em background).
+# nextAttemptAt = quando pode ser (re)tentado; enquanto um worker envia, vale como "lease".
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_status_nextAttemptAt", "status", "nextAttemptAt"),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    toEmail = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(String, nullable=False)
+
+    status = Column(String, nullable=False, default="pending")  # pending | sent | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    nextAttemptAt = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    lastError = Column(String, nullable=True)
+
+    createdAt = Column(DateTime(timezone=True), server_default=func.now())
+    sentAt = Column(DateTime(timezone=True), nullable=True)
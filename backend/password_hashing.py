@@ -0,0 +1,161 @@
+# password_hashing.py
+"""
+Hash / verificação de senha (PBKDF2-SHA256, 120k iterações) fora do pool de threads das rotas.
+
+- roda num ProcessPoolExecutor dedicado (PASSWORD_POOL_WORKERS processos): CPU de verdade
+  em paralelo, sem disputar o GIL com o resto da API
+- fila limitada (PASSWORD_POOL_MAX_PENDING): cheia -> PasswordPoolBusy na hora (a rota
+  responde 429). Assim uma rajada de logins ocupa no máximo esse tanto de threads do anyio
+  esperando resultado, e as outras rotas sync continuam atendendo
+- métricas em password_pool.stats(): fila atual / pico, enviados, recusados, latência
+
+As funções pbkdf2_* são puras (só stdlib): é o que os processos filhos importam.
+"""
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+
+PASSWORD_HASH_ITERATIONS = 120_000
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_POOL_MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", str(PASSWORD_POOL_WORKERS * 4)))
+PASSWORD_POOL_TIMEOUT_SEC = float(os.getenv("PASSWORD_POOL_TIMEOUT_SEC", "10"))
+# janela das últimas N latências usada para p50 / p99
+PASSWORD_POOL_LATENCY_WINDOW = 1000
+
+
+class PasswordPoolBusy(Exception):
+    """Fila de hash cheia (ou resultado demorou demais): responder 429."""
+
+
+# ---------- funções puras (rodam no processo filho) ----------
+def pbkdf2_hash(password: str, iters: int = PASSWORD_HASH_ITERATIONS) -> str:
+    salt = secrets.token_bytes(16)
+    dk = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iters, dklen=32)
+    return "pbkdf2$%d$%s$%s" % (
+        iters,
+        base64.urlsafe_b64encode(salt).decode("utf-8"),
+        base64.urlsafe_b64encode(dk).decode("utf-8"),
+    )
+
+
+def pbkdf2_verify(password: str, stored: str) -> bool:
+    try:
+        parts = stored.split("$")
+        if len(parts) != 4:
+            return False
+        _, iters_s, salt_b64, dk_b64 = parts
+        iters = int(iters_s)
+        salt = base64.urlsafe_b64decode(salt_b64.encode("utf-8"))
+        dk = base64.urlsafe_b64decode(dk_b64.encode("utf-8"))
+        test = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iters, dklen=len(dk))
+        return hmac.compare_digest(test, dk)
+    except Exception:
+        return False
+
+
+# ---------- pool ----------
+class PasswordPool:
+    def __init__(self, workers: int = PASSWORD_POOL_WORKERS, max_pending: int = PASSWORD_POOL_MAX_PENDING):
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.pending = 0
+        self.peak_pending = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._latencies_ms = deque(maxlen=PASSWORD_POOL_LATENCY_WINDOW)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: fork de um processo com threads (sweeper, snapshot, SSE) não é seguro
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordPoolBusy()
+            self.pending += 1
+            self.submitted += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+            executor = self._get_executor()
+
+        started = time.perf_counter()
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        # a vaga só volta quando o processo filho termina (ou o pedido é cancelado na fila):
+        # desistir de esperar não pode abrir espaço para mais trabalho no executor
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=PASSWORD_POOL_TIMEOUT_SEC)
+        except FutureTimeoutError:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise PasswordPoolBusy()
+        except BrokenProcessPool:
+            # processo filho morreu (OOM / kill): o próximo pedido cria outro pool
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._latencies_ms.append(elapsed)
+
+    def _release(self, _future):
+        with self._lock:
+            self.pending -= 1
+
+    def hash(self, password: str) -> str:
+        return self._run(pbkdf2_hash, password)
+
+    def verify(self, password: str, stored: str) -> bool:
+        return self._run(pbkdf2_verify, password, stored)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lat = sorted(self._latencies_ms)
+            return {
+                "workers": self.workers,
+                "maxPending": self.max_pending,
+                "pending": self.pending,
+                "peakPending": self.peak_pending,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "latencyMs": {
+                    "p50": round(lat[len(lat) // 2], 1) if lat else None,
+                    "p99": round(lat[min(len(lat) - 1, int(len(lat) * 0.99))], 1) if lat else None,
+                    "max": round(lat[-1], 1) if lat else None,
+                },
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_pool = PasswordPool()
@@ -0,0 +1,196 @@
+# price_history.py
+"""
+Histórico append-only de preços (tabela price_history).
+
+- record_price_changes() é chamado pelas rotas de escrita ANTES do commit
+  (mesma transação do preço: ou grava os dois, ou nenhum)
+- as consultas devolvem série diária (min / max / último) já agregada no banco,
+  com "carry forward" nos dias sem mudança, então o gráfico nunca carrega pontos crus
+- série do produto em todos os mercados: o banco monta os intervalos em que cada preço
+  valeu (LEAD) e agrupa por dia (GROUP BY), sem laço dias × mercados no Python
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import Date, and_, case, func, insert, literal, or_, select
+from sqlalchemy.orm import Session
+
+from models import Price, PriceHistory
+
+
+HISTORY_MAX_DAYS = 365
+
+
+def to_cents(price: float) -> int:
+    return int(round(float(price) * 100))
+
+
+def record_price_changes(db: Session, rows: Iterable[dict], when: Optional[datetime] = None):
+    """rows: [{"priceId", "price"}] — só pares cujo preço realmente mudou (ou novos)."""
+    when = when or datetime.now(timezone.utc)
+    values = [{"priceId": r["priceId"], "priceCents": to_cents(r["price"]), "recordedAt": when} for r in rows]
+    if values:
+        db.execute(insert(PriceHistory), values)
+
+
+def _day(value) -> date:
+    # Postgres devolve date; SQLite devolve "AAAA-MM-DD"
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _daily_by_price(db: Session, price_id: int, since: datetime) -> Dict[date, tuple]:
+    """{dia: (min, max, último)} em centavos de um par, agregado no banco."""
+    day_col = func.date(PriceHistory.recordedAt)
+    ranked = (
+        select(
+            day_col.label("day"),
+            PriceHistory.priceCents.label("cents"),
+            func.row_number().over(
+                partition_by=day_col,
+                order_by=(PriceHistory.recordedAt.desc(), PriceHistory.id.desc()),
+            ).label("rn"),
+        )
+        .where(PriceHistory.priceId == price_id, PriceHistory.recordedAt >= since)
+        .subquery()
+    )
+    stmt = select(
+        ranked.c.day,
+        func.min(ranked.c.cents),
+        func.max(ranked.c.cents),
+        func.max(case((ranked.c.rn == 1, ranked.c.cents))),
+    ).group_by(ranked.c.day)
+    return {_day(day): (lo, hi, last) for day, lo, hi, last in db.execute(stmt)}
+
+
+def _last_before(db: Session, price_id: int, since: datetime) -> Optional[int]:
+    """Último preço (centavos) do par antes do início da janela."""
+    stmt = (
+        select(PriceHistory.priceCents)
+        .where(PriceHistory.priceId == price_id, PriceHistory.recordedAt < since)
+        .order_by(PriceHistory.recordedAt.desc(), PriceHistory.id.desc())
+        .limit(1)
+    )
+    return db.scalar(stmt)
+
+
+def _window(days: int):
+    days = max(1, min(int(days), HISTORY_MAX_DAYS))
+    today = datetime.now(timezone.utc).date()
+    first_day = today - timedelta(days=days - 1)
+    since = datetime(first_day.year, first_day.month, first_day.day, tzinfo=timezone.utc)
+    return first_day, today, since
+
+
+def _cents_to_price(cents: Optional[int]) -> Optional[float]:
+    return None if cents is None else cents / 100.0
+
+
+def daily_series(db: Session, price_id: int, days: int = 90) -> dict:
+    """Série diária de um par (mercado, produto): min/max do dia (considerando o preço em vigor) e último valor."""
+    first_day, today, since = _window(days)
+    by_day = _daily_by_price(db, price_id, since)
+    current = _last_before(db, price_id, since)
+
+    series = []
+    lowest = None
+    d = first_day
+    while d <= today:
+        bucket = by_day.get(d)
+        if bucket is not None:
+            lo, hi, last = bucket
+            # no dia da mudança conta também o valor que estava valendo antes
+            if current is not None:
+                lo, hi = min(lo, current), max(hi, current)
+            current = last
+        elif current is not None:
+            lo = hi = current
+        else:
+            d += timedelta(days=1)
+            continue
+
+        series.append({
+            "date": d.isoformat(),
+            "min": _cents_to_price(lo),
+            "max": _cents_to_price(hi),
+            "last": _cents_to_price(current),
+        })
+        if lowest is None or lo < lowest:
+            lowest = lo
+        d += timedelta(days=1)
+
+    return {"days": series, "lowest": _cents_to_price(lowest)}
+
+
+def _days_cte(db: Session, first_day: date, last_day: date):
+    """Tabela (day) com um dia por linha de first_day a last_day (CTE recursiva)."""
+    days = select(literal(first_day, Date).label("day")).cte("days", recursive=True)
+    if db.get_bind().dialect.name == "sqlite":
+        next_day = func.date(days.c.day, "+1 day")
+    else:
+        next_day = days.c.day + 1
+    return days.union_all(select(next_day).where(days.c.day < last_day))
+
+
+def product_daily_series(db: Session, product_id: str, days: int = 90) -> dict:
+    """
+    Série diária do produto em todos os mercados: min/max do dia entre os preços em vigor
+    e quantos mercados tinham preço. Agregado no banco (1 linha por dia).
+    """
+    first_day, today, since = _window(days)
+
+    # intervalos [start_day, end_day] em que cada preço valeu (end_day NULL = vale até hoje)
+    seg = (
+        select(
+            PriceHistory.priceId.label("price_id"),
+            PriceHistory.priceCents.label("cents"),
+            func.date(PriceHistory.recordedAt).label("start_day"),
+            func.date(
+                func.lead(PriceHistory.recordedAt).over(
+                    partition_by=PriceHistory.priceId,
+                    order_by=(PriceHistory.recordedAt, PriceHistory.id),
+                )
+            ).label("end_day"),
+        )
+        .join(Price, Price.id == PriceHistory.priceId)
+        .where(Price.productId == product_id)
+        .subquery()
+    )
+    day_table = _days_cte(db, first_day, today)
+    stmt = (
+        select(
+            day_table.c.day,
+            func.min(seg.c.cents),
+            func.max(seg.c.cents),
+            func.count(func.distinct(seg.c.price_id)),
+        )
+        .select_from(day_table)
+        .join(
+            seg,
+            and_(
+                seg.c.start_day <= day_table.c.day,
+                # no dia da mudança conta também o valor que estava valendo antes
+                or_(seg.c.end_day.is_(None), seg.c.end_day >= day_table.c.day),
+            ),
+        )
+        .group_by(day_table.c.day)
+        .order_by(day_table.c.day)
+    )
+
+    series = []
+    lowest = None
+    for day, lo, hi, markets in db.execute(stmt):
+        series.append({
+            "date": _day(day).isoformat(),
+            "min": _cents_to_price(lo),
+            "max": _cents_to_price(hi),
+            "markets": markets,
+        })
+        if lowest is None or lo < lowest:
+            lowest = lo
+    return {"days": series, "lowest": _cents_to_price(lowest)}
+
+
+def price_id_for(db: Session, product_id: str, market_id: str) -> Optional[int]:
+    return db.scalar(select(Price.id).where(Price.productId == product_id, Price.marketId == market_id))
@@ -0,0 +1,183 @@
+# price_matrix.py
+"""
+Matriz mercado × produto de preços em memória (por processo).
+
+Formato: esparso por coluna (cada produto guarda os mercados que têm preço).
+Uma matriz densa 5k mercados × 50k produtos passaria de 1 GB, então:
+- market_id/product_id -> índice inteiro (0..n)
+- por produto: {indice_mercado: preço} + cache numpy (idx int32, preço float64)
+- basket_block() monta o bloco denso (mercados × itens da cesta) só para os produtos pedidos
+
+As rotas de escrita em routes/data.py chamam apply_price_changes() depois do commit.
+Com vários workers cada processo tem a sua cópia; PRICE_MATRIX_MAX_AGE_SEC força um
+reload periódico para pegar escritas feitas por outros processos.
+"""
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import Price
+
+
+PRICE_MATRIX_MAX_AGE_SEC = int(os.getenv("PRICE_MATRIX_MAX_AGE_SEC", "300"))
+PRICE_MATRIX_LOAD_CHUNK = 5000
+
+
+class PriceMatrix:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+        self.loaded_at: Optional[float] = None
+        self._replay: Optional[List[dict]] = None
+
+    def _reset(self):
+        self.market_ids: List[str] = []
+        self.market_index: Dict[str, int] = {}
+        self.product_ids: List[str] = []
+        self.product_index: Dict[str, int] = {}
+        self._cols: Dict[int, Dict[int, float]] = {}
+        self._col_cache: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+
+    # ---------- índices ----------
+    def _market_idx(self, market_id: str) -> int:
+        idx = self.market_index.get(market_id)
+        if idx is None:
+            idx = len(self.market_ids)
+            self.market_ids.append(market_id)
+            self.market_index[market_id] = idx
+        return idx
+
+    def _product_idx(self, product_id: str) -> int:
+        idx = self.product_index.get(product_id)
+        if idx is None:
+            idx = len(self.product_ids)
+            self.product_ids.append(product_id)
+            self.product_index[product_id] = idx
+        return idx
+
+    @property
+    def n_markets(self) -> int:
+        return len(self.market_ids)
+
+    # ---------- carga / escrita ----------
+    def load(self, db: Session):
+        """Monta a matriz nova fora do lock e troca de uma vez: leitores nunca esperam o scan."""
+        stmt = select(Price.marketId, Price.productId, Price.price).execution_options(
+            yield_per=PRICE_MATRIX_LOAD_CHUNK
+        )
+        with self._lock:
+            # escritas commitadas durante o scan podem não aparecer nele: guarda para reaplicar
+            self._replay = []
+        fresh = PriceMatrix()
+        try:
+            for rows in db.execute(stmt).partitions():
+                for market_id, product_id, price in rows:
+                    fresh._set(market_id, product_id, price)
+        except BaseException:
+            with self._lock:
+                self._replay = None
+            raise
+        with self._lock:
+            for r in self._replay:
+                fresh._set(r["marketId"], r["productId"], r["price"])
+            self._replay = None
+            self.market_ids, self.market_index = fresh.market_ids, fresh.market_index
+            self.product_ids, self.product_index = fresh.product_ids, fresh.product_index
+            self._cols, self._col_cache = fresh._cols, fresh._col_cache
+            self.loaded_at = time.monotonic()
+
+    def is_stale(self) -> bool:
+        if self.loaded_at is None:
+            return True
+        return PRICE_MATRIX_MAX_AGE_SEC > 0 and (time.monotonic() - self.loaded_at) > PRICE_MATRIX_MAX_AGE_SEC
+
+    def _set(self, market_id: str, product_id: str, price: float):
+        m = self._market_idx(market_id)
+        p = self._product_idx(product_id)
+        col = self._cols.get(p)
+        if col is None:
+            col = self._cols[p] = {}
+        col[m] = float(price)
+        self._col_cache.pop(p, None)
+
+    def set_price(self, market_id: str, product_id: str, price: float):
+        self.set_many([{"marketId": market_id, "productId": product_id, "price": price}])
+
+    def set_many(self, rows: Iterable[dict]):
+        with self._lock:
+            if self.loaded_at is None and self._replay is None:
+                return
+            for r in rows:
+                if self._replay is not None:
+                    self._replay.append(r)
+                if self.loaded_at is not None:
+                    self._set(r["marketId"], r["productId"], r["price"])
+
+    # ---------- consultas ----------
+    def column(self, product_id: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(índices de mercado, preços) de um produto. Arrays vazios se não houver preço."""
+        with self._lock:
+            p = self.product_index.get(product_id)
+            if p is None:
+                return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+            cached = self._col_cache.get(p)
+            if cached is None:
+                col = self._cols.get(p) or {}
+                idx = np.fromiter(col.keys(), dtype=np.int32, count=len(col))
+                vals = np.fromiter(col.values(), dtype=np.float64, count=len(col))
+                cached = self._col_cache[p] = (idx, vals)
+            return cached
+
+    def get_price(self, market_id: str, product_id: str) -> Optional[float]:
+        with self._lock:
+            m = self.market_index.get(market_id)
+            p = self.product_index.get(product_id)
+            if m is None or p is None:
+                return None
+            return (self._cols.get(p) or {}).get(m)
+
+    def basket_block(self, product_ids: List[str], market_idx: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Bloco denso (mercados × produtos) com NaN onde o mercado não tem o produto.
+        market_idx restringe as linhas a um subconjunto de mercados (na ordem dada).
+        """
+        with self._lock:
+            n = self.n_markets
+            block = np.full((n, len(product_ids)), np.nan, dtype=np.float64)
+            for j, product_id in enumerate(product_ids):
+                idx, vals = self.column(product_id)
+                if idx.size:
+                    block[idx, j] = vals
+        if market_idx is not None:
+            return block[market_idx]
+        return block
+
+
+price_matrix = PriceMatrix()
+_load_lock = threading.Lock()
+
+
+def get_price_matrix(db: Session) -> PriceMatrix:
+    """Carrega a matriz na primeira chamada (e quando passa de PRICE_MATRIX_MAX_AGE_SEC)."""
+    if price_matrix.loaded_at is None:
+        with _load_lock:
+            if price_matrix.loaded_at is None:
+                price_matrix.load(db)
+    elif price_matrix.is_stale() and _load_lock.acquire(blocking=False):
+        # reload periódico: uma requisição recarrega, as outras seguem com a matriz atual
+        try:
+            if price_matrix.is_stale():
+                price_matrix.load(db)
+        finally:
+            _load_lock.release()
+    return price_matrix
+
+
+def apply_price_changes(rows: Iterable[dict]):
+    """rows: [{"marketId", "productId", "price"}] já gravados no banco."""
+    price_matrix.set_many(rows)
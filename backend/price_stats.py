@@ -0,0 +1,204 @@
+# price_stats.py
+"""
+Estatísticas de preço por produto (min / max / média / mediana / nº de mercados),
+no geral e por cidade / estado do mercado — mantidas em memória e atualizadas a cada
+gravação de preço (catalog_hooks), sem GROUP BY por request.
+
+Por escopo (produto, "all"|"city"|"state", valor):
+- lista ORDENADA de preços em centavos (multiconjunto: bisect.insort / remove)
+  -> min = [0], max = [-1], mediana = meio da lista
+- soma em centavos -> média
+
+Cidade/estado são normalizados (sem acento, minúsculo) para "São Paulo" == "sao paulo".
+O escopo de cidade é "estado|cidade": "Bom Jesus" de PI e de RS são cidades diferentes.
+
+Preços gravados em OUTROS workers entram na recarga (index_reload.IndexReloader): a cada
+PRICE_STATS_MAX_AGE_SEC, como a price_matrix, ou quando a tabela markets muda. A carga
+nova é montada fora do lock e trocada de uma vez.
+"""
+import bisect
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from index_reload import IndexReloader
+from models import Market, Price
+from price_history import to_cents
+from search_index import fold_accents
+
+
+PRICE_STATS_MAX_AGE_SEC = int(os.getenv("PRICE_STATS_MAX_AGE_SEC", "300"))
+
+_Scope = Tuple[str, str, str]
+
+
+def _norm(value: Optional[str]) -> str:
+    return " ".join(fold_accents(value or "").split())
+
+
+def _city_key(city: str, state: str) -> str:
+    """city/state já normalizados."""
+    return f"{state}|{city}"
+
+
+class PriceStats:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded_at: Optional[float] = None
+        self._replay: Optional[List[tuple]] = None
+        self._reset()
+
+    def _reset(self):
+        self._sorted: Dict[_Scope, List[int]] = {}
+        self._sum: Dict[_Scope, int] = {}
+        self._pairs: Dict[str, Dict[str, int]] = {}  # marketId -> {productId: centavos}
+        self._market_loc: Dict[str, Tuple[str, str]] = {}  # marketId -> (cidade, estado)
+
+    def _scopes(self, product_id: str, market_id: str) -> List[_Scope]:
+        city, state = self._market_loc.get(market_id, ("", ""))
+        scopes = [(product_id, "all", "")]
+        if city:
+            scopes.append((product_id, "city", _city_key(city, state)))
+        if state:
+            scopes.append((product_id, "state", state))
+        return scopes
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    # ---------- carga ----------
+    def load(self, db: Session):
+        """Monta as estatísticas novas fora do lock e troca de uma vez: leitores nunca esperam o scan."""
+        with self._lock:
+            # escritas commitadas durante o scan podem não aparecer nele: guarda para reaplicar
+            self._replay = []
+        fresh = PriceStats()
+        try:
+            fresh._build(db)
+        except BaseException:
+            with self._lock:
+                self._replay = None
+            raise
+        with self._lock:
+            fresh.loaded_at = time.monotonic()
+            for op, *args in self._replay:
+                getattr(fresh, op)(*args)
+            self._replay = None
+            self._sorted, self._sum = fresh._sorted, fresh._sum
+            self._pairs, self._market_loc = fresh._pairs, fresh._market_loc
+            self.loaded_at = time.monotonic()
+
+    def _build(self, db: Session):
+        stmt = select(Price.marketId, Price.productId, Price.price).execution_options(yield_per=5000)
+        for market_id, city, state in db.execute(select(Market.id, Market.city, Market.state)):
+            self._market_loc[market_id] = (_norm(city), _norm(state))
+        for rows in db.execute(stmt).partitions():
+            for market_id, product_id, price in rows:
+                cents = to_cents(price)
+                self._pairs.setdefault(market_id, {})[product_id] = cents
+                for scope in self._scopes(product_id, market_id):
+                    self._sorted.setdefault(scope, []).append(cents)
+                    self._sum[scope] = self._sum.get(scope, 0) + cents
+        # ordena uma vez só no fim (mais barato que insort linha a linha)
+        for values in self._sorted.values():
+            values.sort()
+
+    # ---------- escrita ----------
+    def _add(self, scopes: Iterable[_Scope], cents: int):
+        for scope in scopes:
+            bisect.insort(self._sorted.setdefault(scope, []), cents)
+            self._sum[scope] = self._sum.get(scope, 0) + cents
+
+    def _discard(self, scopes: Iterable[_Scope], cents: int):
+        for scope in scopes:
+            values = self._sorted.get(scope)
+            if not values:
+                continue
+            i = bisect.bisect_left(values, cents)
+            if i < len(values) and values[i] == cents:
+                del values[i]
+                self._sum[scope] -= cents
+            if not values:
+                del self._sorted[scope]
+                self._sum.pop(scope, None)
+
+    def apply(self, rows: Iterable[dict]):
+        """rows: [{"marketId", "productId", "price"}] já commitados."""
+        with self._lock:
+            if self._replay is not None:
+                rows = list(rows)
+                self._replay.append(("apply", rows))
+            if not self.loaded:
+                return
+            for r in rows:
+                market_id, product_id = r["marketId"], r["productId"]
+                cents = to_cents(r["price"])
+                by_product = self._pairs.setdefault(market_id, {})
+                old = by_product.get(product_id)
+                if old == cents:
+                    continue
+                scopes = self._scopes(product_id, market_id)
+                if old is not None:
+                    self._discard(scopes, old)
+                self._add(scopes, cents)
+                by_product[product_id] = cents
+
+    def market_changed(self, market_id: str, city: Optional[str], state: Optional[str]):
+        """Mercado mudou de cidade/estado: move os preços dele de escopo."""
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(("market_changed", market_id, city, state))
+            if not self.loaded:
+                return
+            new_loc = (_norm(city), _norm(state))
+            old_loc = self._market_loc.get(market_id)
+            if old_loc == new_loc:
+                return
+            prices = self._pairs.get(market_id, {})
+            for product_id, cents in prices.items():
+                self._discard([s for s in self._scopes(product_id, market_id) if s[1] != "all"], cents)
+            self._market_loc[market_id] = new_loc
+            for product_id, cents in prices.items():
+                self._add([s for s in self._scopes(product_id, market_id) if s[1] != "all"], cents)
+
+    # ---------- consulta ----------
+    def _summary(self, scope: _Scope) -> Optional[dict]:
+        values = self._sorted.get(scope)
+        if not values:
+            return None
+        n = len(values)
+        mid = n // 2
+        median = values[mid] if n % 2 else (values[mid - 1] + values[mid]) / 2
+        return {
+            "min": values[0] / 100.0,
+            "max": values[-1] / 100.0,
+            "mean": round(self._sum[scope] / n / 100.0, 2),
+            "median": round(median / 100.0, 2),
+            "markets": n,
+        }
+
+    def summary(self, product_id: str, city: Optional[str] = None, state: Optional[str] = None) -> dict:
+        """city só vale junto com state (há cidades com o mesmo nome em vários estados)."""
+        if city and not state:
+            raise ValueError("city exige state")
+        with self._lock:
+            out = {"productId": product_id, "overall": self._summary((product_id, "all", ""))}
+            if city:
+                out["city"] = self._summary((product_id, "city", _city_key(_norm(city), _norm(state))))
+            if state:
+                out["state"] = self._summary((product_id, "state", _norm(state)))
+            return out
+
+
+price_stats = PriceStats()
+_reloader = IndexReloader(price_stats, PRICE_STATS_MAX_AGE_SEC, tables=("markets",))
+
+
+def get_price_stats(db: Session) -> PriceStats:
+    """Carrega na primeira chamada; depois recarrega (1 requisição, as outras seguem com o atual)."""
+    return _reloader.get(db)
@@ -0,0 +1,151 @@
+# price_stream.py
+"""
+Broadcast em memória das mudanças de preço para os clientes SSE (GET /api/prices/stream).
+
+- cada cliente tem uma asyncio.Queue LIMITADA (PRICE_STREAM_QUEUE_MAX publicações): cada
+  publish() ocupa UM item (o lote já filtrado e coalescido por mercado+produto), então um
+  bulk de 500 linhas não enche a fila de ninguém
+- cliente que fica PRICE_STREAM_QUEUE_MAX publicações atrás é DERRUBADO (recebe
+  "event: dropped" e a conexão fecha), em vez de acumular memória no servidor;
+  o EventSource do navegador reconecta sozinho
+- publish() pode ser chamado de qualquer thread (as rotas síncronas rodam no threadpool):
+  o fan-out sempre roda dentro do event loop via call_soon_threadsafe
+
+Só existe dentro do processo: com vários workers, cada um transmite as escritas que recebeu.
+"""
+import asyncio
+import json
+import threading
+from datetime import datetime, timezone
+from typing import Iterable, Optional, Set
+
+
+PRICE_STREAM_QUEUE_MAX = 256
+PRICE_STREAM_MAX_CLIENTS = 1000
+PRICE_STREAM_PING_SEC = 15.0
+
+
+class _Subscriber:
+    __slots__ = ("queue", "market_id", "product_id", "dropped")
+
+    def __init__(self, market_id: Optional[str], product_id: Optional[str]):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=PRICE_STREAM_QUEUE_MAX)
+        self.market_id = market_id
+        self.product_id = product_id
+        self.dropped = False
+
+    def wants(self, ev: dict) -> bool:
+        if self.market_id and ev["marketId"] != self.market_id:
+            return False
+        if self.product_id and ev["productId"] != self.product_id:
+            return False
+        return True
+
+
+class PriceBroadcastHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subs: Set[_Subscriber] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.dropped_total = 0
+
+    def __len__(self):
+        return len(self._subs)
+
+    def subscribe(self, market_id: Optional[str] = None, product_id: Optional[str] = None) -> Optional[_Subscriber]:
+        """Chamado dentro do event loop. None = limite de clientes atingido."""
+        with self._lock:
+            if len(self._subs) >= PRICE_STREAM_MAX_CLIENTS:
+                return None
+            self._loop = asyncio.get_running_loop()
+            sub = _Subscriber(market_id, product_id)
+            self._subs.add(sub)
+            return sub
+
+    def unsubscribe(self, sub: _Subscriber):
+        with self._lock:
+            self._subs.discard(sub)
+
+    def publish(self, rows: Iterable[dict]):
+        """rows: [{"marketId", "productId", "price", "oldPrice"?}] — chamado depois do commit."""
+        if not self._subs:
+            return
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        at = datetime.now(timezone.utc).isoformat()
+        events = [
+            {
+                "marketId": r["marketId"],
+                "productId": r["productId"],
+                "price": r["price"],
+                "oldPrice": r.get("oldPrice"),
+                "at": at,
+            }
+            for r in rows
+        ]
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._fanout(events)
+        else:
+            loop.call_soon_threadsafe(self._fanout, events)
+
+    def _fanout(self, events: list):
+        # coalesce por mercado+produto: dentro de um lote só o último preço importa
+        latest = {}
+        for ev in events:
+            latest[(ev["marketId"], ev["productId"])] = ev
+        events = list(latest.values())
+        with self._lock:
+            subs = list(self._subs)
+        for sub in subs:
+            if sub.dropped:
+                continue
+            batch = [ev for ev in events if sub.wants(ev)]
+            if not batch:
+                continue
+            try:
+                sub.queue.put_nowait(batch)
+            except asyncio.QueueFull:
+                self._drop(sub)
+
+    def _drop(self, sub: _Subscriber):
+        sub.dropped = True
+        self.unsubscribe(sub)
+        self.dropped_total += 1
+        # acorda o gerador do cliente (a fila está cheia: troca o evento mais velho pelo aviso)
+        try:
+            sub.queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+        sub.queue.put_nowait(None)
+
+
+price_hub = PriceBroadcastHub()
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def sse_events(sub: _Subscriber, request):
+    """Gerador do StreamingResponse: eventos "price", ping de keep-alive e "dropped"."""
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                batch = await asyncio.wait_for(sub.queue.get(), timeout=PRICE_STREAM_PING_SEC)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": ping\n\n"
+                continue
+            if batch is None:
+                yield _sse("dropped", {"reason": "slow consumer"})
+                break
+            yield "".join(_sse("price", ev) for ev in batch)
+    finally:
+        price_hub.unsubscribe(sub)
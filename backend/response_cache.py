@@ -0,0 +1,135 @@
+# response_cache.py
+"""
+Cache de respostas em memória (LRU limitado em BYTES) para as listas quentes de leitura.
+
+- guarda o JSON já serializado: hit = devolve os bytes, sem SQL e sem Pydantic
+- chaves explícitas, invalidadas uma a uma pelos hooks de escrita (catalog_hooks):
+    ("products",)                 GET /api/products
+    ("markets", businessId|None)  GET /api/markets[?businessId=]
+    ("prices", marketId, productId) GET /api/prices?marketId=&productId= (pelo menos 1 filtro)
+- corrida "lê do banco / alguém grava / guarda bytes velhos" é evitada: se a chave for
+  invalidada enquanto a resposta está sendo montada, o resultado não entra no cache
+
+Por processo: com vários workers as escritas de um não invalidam o cache do outro. Por isso:
+- products/markets passam a versão da tabela no banco (a mesma do ETag): entrada gravada
+  com outra versão é miss, então nenhum worker serve a lista velha
+- toda entrada expira em RESPONSE_CACHE_TTL_SEC (limite de atraso das listas de preço,
+  que não têm versão própria por filtro)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# uma resposta sozinha não pode ocupar mais que isso do cache
+RESPONSE_CACHE_MAX_ENTRY_FRACTION = 0.25
+RESPONSE_CACHE_TTL_SEC = float(os.getenv("RESPONSE_CACHE_TTL_SEC", "30"))
+
+
+class ResponseCache:
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self._lock = threading.Lock()
+        self.max_bytes = max_bytes
+        # chave -> (bytes, versão, expira_em)
+        self._data: "OrderedDict[Hashable, Tuple[bytes, Optional[int], float]]" = OrderedDict()
+        self._bytes = 0
+        self._seq = 0
+        self._inflight: Dict[Hashable, int] = {}
+        self._dirty: Dict[Hashable, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: Hashable, version: Optional[int] = None) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (entry[1] != version or entry[2] <= time.monotonic()):
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _drop(self, key: Hashable):
+        old = self._data.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old[0])
+
+    def _put(self, key: Hashable, data: bytes, version: Optional[int]):
+        if len(data) > self.max_bytes * RESPONSE_CACHE_MAX_ENTRY_FRACTION:
+            return
+        self._drop(key)
+        self._data[key] = (data, version, time.monotonic() + RESPONSE_CACHE_TTL_SEC)
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes and self._data:
+            _, evicted = self._data.popitem(last=False)
+            self._bytes -= len(evicted[0])
+
+    def get_or_fill(self, key: Hashable, producer: Callable[[], bytes], version: Optional[int] = None) -> bytes:
+        """version: versão dos dados no banco lida ANTES do producer (entrada de outra versão = miss)."""
+        data = self.get(key, version)
+        if data is not None:
+            return data
+
+        with self._lock:
+            token = self._seq
+            self._inflight[key] = self._inflight.get(key, 0) + 1
+        stale = True
+        try:
+            data = producer()
+            stale = False
+        finally:
+            with self._lock:
+                if not stale and self._dirty.get(key, -1) > token:
+                    stale = True
+                n = self._inflight[key] - 1
+                if n:
+                    self._inflight[key] = n
+                else:
+                    del self._inflight[key]
+                    self._dirty.pop(key, None)
+                if not stale:
+                    self._put(key, data, version)
+        return data
+
+    def invalidate(self, keys: Iterable[Hashable]):
+        with self._lock:
+            self._seq += 1
+            for key in keys:
+                self._drop(key)
+                if key in self._inflight:
+                    self._dirty[key] = self._seq
+
+    def clear(self):
+        with self._lock:
+            self._seq += 1
+            for key in self._inflight:
+                self._dirty[key] = self._seq
+            self._data.clear()
+            self._bytes = 0
+
+
+response_cache = ResponseCache()
+
+
+def price_keys(rows: Iterable[dict]) -> set:
+    """Chaves de /api/prices afetadas por mudanças nos pares (marketId, productId)."""
+    keys = set()
+    for r in rows:
+        m, p = r["marketId"], r["productId"]
+        keys.add(("prices", m, p))
+        keys.add(("prices", m, None))
+        keys.add(("prices", None, p))
+    return keys
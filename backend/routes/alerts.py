@@ -0,0 +1,120 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials
+from pydantic import BaseModel
+from typing import Optional
+from sqlalchemy.orm import Session
+
+from db import get_db
+from models import PriceAlert, Product, Market
+from auth_jwt import get_current_user, security
+
+router = APIRouter(prefix="/price-alerts", tags=["Price Alerts"])
+
+
+class PriceAlertIn(BaseModel):
+    productId: str
+    targetPrice: float
+    marketId: Optional[str] = None
+    sessionId: Optional[str] = None
+
+
+# ✅ NOVO: alerta funciona logado (userId) ou como visitante (sessionId)
+def _optional_user(
+    request: Request,
+    creds: HTTPAuthorizationCredentials | None = Depends(security),
+    db: Session = Depends(get_db),
+):
+    try:
+        return get_current_user(request, creds, db)
+    except HTTPException:
+        return None
+
+
+def _user_id(user) -> Optional[str]:
+    if user is None:
+        return None
+    try:
+        uid = user.get("id") if isinstance(user, dict) else getattr(user, "id", None)
+    except Exception:
+        uid = None
+    return str(uid) if uid else None
+
+
+def _serialize(a: PriceAlert):
+    return {
+        "id": a.id,
+        "productId": a.productId,
+        "marketId": a.marketId,
+        "targetPrice": a.targetPrice,
+        "isActive": a.isActive,
+        "createdAt": a.createdAt.isoformat() if a.createdAt else None,
+        "triggeredAt": a.triggeredAt.isoformat() if a.triggeredAt else None,
+        "triggeredPrice": a.triggeredPrice,
+        "triggeredMarketId": a.triggeredMarketId,
+    }
+
+
+def _owner_filter(q, user_id: Optional[str], session_id: Optional[str]):
+    if user_id:
+        return q.filter(PriceAlert.userId == user_id)
+    if session_id:
+        return q.filter(PriceAlert.userId.is_(None), PriceAlert.sessionId == session_id)
+    raise HTTPException(status_code=401, detail="login ou sessionId obrigatório")
+
+
+# GET /api/price-alerts?productId=...&sessionId=...
+@router.get("")
+def list_price_alerts(
+    productId: Optional[str] = None,
+    sessionId: Optional[str] = None,
+    user=Depends(_optional_user),
+    db: Session = Depends(get_db),
+):
+    q = _owner_filter(db.query(PriceAlert), _user_id(user), sessionId)
+    if productId:
+        q = q.filter(PriceAlert.productId == productId)
+    return [_serialize(a) for a in q.order_by(PriceAlert.createdAt.desc()).all()]
+
+
+# POST /api/price-alerts
+@router.post("")
+def create_price_alert(payload: PriceAlertIn, user=Depends(_optional_user), db: Session = Depends(get_db)):
+    user_id = _user_id(user)
+    if not user_id and not payload.sessionId:
+        raise HTTPException(status_code=401, detail="login ou sessionId obrigatório")
+    if payload.targetPrice <= 0:
+        raise HTTPException(status_code=400, detail="targetPrice inválido")
+    if not db.query(Product.id).filter(Product.id == payload.productId).first():
+        raise HTTPException(status_code=404, detail="produto não encontrado")
+    if payload.marketId and not db.query(Market.id).filter(Market.id == payload.marketId).first():
+        raise HTTPException(status_code=404, detail="mercado não encontrado")
+
+    alert = PriceAlert(
+        userId=user_id,
+        sessionId=None if user_id else payload.sessionId,
+        productId=payload.productId,
+        marketId=payload.marketId or None,
+        targetPrice=payload.targetPrice,
+        isActive=True,
+    )
+    db.add(alert)
+    db.commit()
+    db.refresh(alert)
+    return _serialize(alert)
+
+
+# DELETE /api/price-alerts/{id}?sessionId=...
+@router.delete("/{alert_id}")
+def delete_price_alert(
+    alert_id: str,
+    sessionId: Optional[str] = None,
+    user=Depends(_optional_user),
+    db: Session = Depends(get_db),
+):
+    alert = _owner_filter(db.query(PriceAlert), _user_id(user), sessionId).filter(PriceAlert.id == alert_id).first()
+    if not alert:
+        raise HTTPException(status_code=404, detail="alerta não encontrado")
+
+    db.delete(alert)
+    db.commit()
+    return {"ok": True}
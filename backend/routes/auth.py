@@ -5,12 +5,14 @@ import uuid
 
 import httpx
 from fastapi import APIRouter, Request, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import RedirectResponse, JSONResponse
 from sqlalchemy.orm import Session
 
 from db import get_db
-from models import User, AuthSession
-from auth_jwt import get_current_user
+from models import User
+from auth_jwt import get_current_user, invalidate_user
+from auth_sessions import new_auth_session
 
 # ✅ NOVO: gera JWT real (sem remover nada do que você já tem)
 try:
@@ -20,18 +22,19 @@ except Exception:
 
 # ✅ NOVO: schemas e helpers para login/cadastro por email/senha
 from pydantic import BaseModel, EmailStr
-import hashlib
 import base64
-import hmac
 
-# ✅ NOVO: envio de e-mail (código de verificação) sem libs externas
-import smtplib
-from email.message import EmailMessage
 from datetime import datetime, timedelta, timezone
 
 # ✅ NOVO: melhora erros e evita 500 silencioso
 from sqlalchemy.exc import IntegrityError
 
+# ✅ NOVO: hash de senha fora das threads das rotas
+from password_hashing import PasswordPoolBusy, password_pool
+
+# ✅ NOVO: envio de e-mail em background (outbox)
+from email_outbox import queue_email, smtp_configured
+
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -55,15 +58,6 @@ ADMIN_BOOTSTRAP_TOKEN = (os.getenv("ADMIN_BOOTSTRAP_TOKEN") or "").strip()
 ADMIN_EMAIL = (os.getenv("ADMIN_EMAIL") or "").strip().lower()
 ADMIN_PASSWORD = (os.getenv("ADMIN_PASSWORD") or "").strip()
 
-# ✅ NOVO: SMTP para envio de código (opcional)
-SMTP_HOST = (os.getenv("SMTP_HOST") or "").strip()
-SMTP_PORT = int((os.getenv("SMTP_PORT") or "587").strip() or "587")
-SMTP_USER = (os.getenv("SMTP_USER") or "").strip()
-SMTP_PASS = (os.getenv("SMTP_PASS") or "").strip()
-SMTP_FROM = (os.getenv("SMTP_FROM") or SMTP_USER or "no-reply@compareeconomize.com").strip()
-SMTP_TLS = (os.getenv("SMTP_TLS") or "1").strip() != "0"
-
-
 # ✅ NOVO: detecta base externa correta atrás de proxy (Railway/Cloudflare/etc.)
 def _external_base_url(request: Request) -> str:
     # 1) Se você definiu PUBLIC_BACKEND_URL, usa ela sempre (mais confiável)
@@ -121,29 +115,19 @@ def _cookie_decode(value: str) -> str:
 # ✅ Password helpers (sem libs externas)
 # ---------------------------
 def _hash_password(password: str) -> str:
-    iters = 120_000
-    salt = secrets.token_bytes(16)
-    dk = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iters, dklen=32)
-    return "pbkdf2$%d$%s$%s" % (
-        iters,
-        base64.urlsafe_b64encode(salt).decode("utf-8"),
-        base64.urlsafe_b64encode(dk).decode("utf-8"),
-    )
+    # ✅ NOVO: PBKDF2 roda no pool de processos (password_hashing); fila cheia -> PasswordPoolBusy
+    return password_pool.hash(password)
 
 
 def _verify_password(password: str, stored: str) -> bool:
-    try:
-        parts = stored.split("$")
-        if len(parts) != 4:
-            return False
-        _, iters_s, salt_b64, dk_b64 = parts
-        iters = int(iters_s)
-        salt = base64.urlsafe_b64decode(salt_b64.encode("utf-8"))
-        dk = base64.urlsafe_b64decode(dk_b64.encode("utf-8"))
-        test = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iters, dklen=len(dk))
-        return hmac.compare_digest(test, dk)
-    except Exception:
+    if not stored or len(stored.split("$")) != 4:
         return False
+    return password_pool.verify(password, stored)
+
+
+def _password_busy_response():
+    # ✅ NOVO: falha rápido em rajada de login/cadastro (não segura thread do servidor)
+    return JSONResponse({"error": "too_many_requests"}, status_code=429, headers={"Retry-After": "1"})
 
 
 # ---------------------------
@@ -160,36 +144,27 @@ def _generate_6digit_code() -> str:
 
 def _send_email_code(to_email: str, code: str) -> bool:
     """
-    Envia email via SMTP se configurado.
+    Coloca o email na outbox (email_outbox.py) e volta na hora; o envio SMTP é em background.
     Se SMTP não estiver configurado, apenas loga (não quebra cadastro).
     """
     to_email = (to_email or "").strip().lower()
     if not to_email:
         return False
 
-    if not SMTP_HOST or not SMTP_USER or not SMTP_PASS:
+    if not smtp_configured():
         print(f"⚠️ SMTP não configurado. Código para {to_email}: {code}")
         return True
 
     try:
-        msg = EmailMessage()
-        msg["Subject"] = "Seu código de verificação - Compare Economize"
-        msg["From"] = SMTP_FROM
-        msg["To"] = to_email
-        msg.set_content(
+        queue_email(
+            to_email,
+            "Seu código de verificação - Compare Economize",
             f"Seu código de verificação é: {code}\n\n"
-            f"Se você não solicitou isso, ignore este email."
+            f"Se você não solicitou isso, ignore este email.",
         )
-
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=20) as server:
-            if SMTP_TLS:
-                server.starttls()
-            server.login(SMTP_USER, SMTP_PASS)
-            server.send_message(msg)
-
         return True
     except Exception as e:
-        print("EMAIL_SEND_ERROR:", repr(e))
+        print("EMAIL_QUEUE_ERROR:", repr(e))
         return False
 
 
@@ -336,7 +311,7 @@ def _issue_token_for_user(u: User, account_type: str):
 
     # mantém sessão fake (como você já fazia)
     try:
-        sess = AuthSession(token=fake_token, userId=u.id)
+        sess = new_auth_session(fake_token, u.id)
         return fake_token, sess
     except Exception:
         return fake_token, None
@@ -556,10 +531,11 @@ async def google_callback(
                 if changed:
                     db.commit()
                     db.refresh(u)
+                    invalidate_user(u.id)
 
             user_id = u.id
 
-            sess = AuthSession(token=fake_token, userId=u.id)
+            sess = new_auth_session(fake_token, u.id, provider="google")
             db.add(sess)
             db.commit()
 
@@ -623,7 +599,7 @@ def register(payload: RegisterIn, db: Session = Depends(get_db)):
 
         fake_token = secrets.token_urlsafe(32)
         try:
-            sess = AuthSession(token=fake_token, userId=u.id)
+            sess = new_auth_session(fake_token, u.id, provider="password")
             db.add(sess)
             db.commit()
         except Exception as e:
@@ -646,6 +622,12 @@ def register(payload: RegisterIn, db: Session = Depends(get_db)):
             "verification_sent": True,
         }
 
+    except PasswordPoolBusy:
+        try:
+            db.rollback()
+        except Exception:
+            pass
+        return _password_busy_response()
     except IntegrityError as e:
         print("AUTH_REGISTER_INTEGRITY_ERROR:", repr(e))
         try:
@@ -713,6 +695,7 @@ def verify_email_code(payload: VerifyEmailCodeIn, db: Session = Depends(get_db))
     _set_user_email_verified(u, True)
     _set_user_verify_code(u, None, None)
     db.commit()
+    invalidate_user(u.id)
 
     return {"ok": True, "email_verified": True}
 
@@ -739,7 +722,7 @@ def login(payload: LoginIn, db: Session = Depends(get_db)):
 
         fake_token = secrets.token_urlsafe(32)
         try:
-            sess = AuthSession(token=fake_token, userId=u.id)
+            sess = new_auth_session(fake_token, u.id, provider="password")
             db.add(sess)
             db.commit()
         except Exception as e:
@@ -762,6 +745,8 @@ def login(payload: LoginIn, db: Session = Depends(get_db)):
             "isAdmin": _get_user_is_admin(u),
         }
 
+    except PasswordPoolBusy:
+        return _password_busy_response()
     except Exception as e:
         print("AUTH_LOGIN_ERROR:", repr(e))
         try:
@@ -827,7 +812,8 @@ async def bootstrap_admin(request: Request, db: Session = Depends(get_db)):
             u = User(id=str(uuid.uuid4()), email=ADMIN_EMAIL)
             _set_user_full_name(u, "Admin")
             _set_user_account_type(u, "business")  # admin pode ver empresa + usuário
-            _set_user_password_hash(u, _hash_password(ADMIN_PASSWORD))
+            # rota async: espera o pool de hash numa thread, sem travar o event loop
+            _set_user_password_hash(u, await run_in_threadpool(_hash_password, ADMIN_PASSWORD))
             _set_user_email_verified(u, True)
             _set_user_verify_code(u, None, None)
             _set_user_admin(u, True)
@@ -839,11 +825,12 @@ async def bootstrap_admin(request: Request, db: Session = Depends(get_db)):
             # promove e garante senha e verificação
             _set_user_admin(u, True)
             if not _get_user_password_hash(u):
-                _set_user_password_hash(u, _hash_password(ADMIN_PASSWORD))
+                _set_user_password_hash(u, await run_in_threadpool(_hash_password, ADMIN_PASSWORD))
             _set_user_email_verified(u, True)
             _set_user_verify_code(u, None, None)
             db.commit()
             db.refresh(u)
+            invalidate_user(u.id)
 
     except Exception as e:
         print("AUTH_BOOTSTRAP_ADMIN_ERROR:", repr(e))
@@ -3,8 +3,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from db import get_db
-from models import Business, Market
+from models import Business, Market, MARKET_COLUMNS, MARKET_FIELDS
 from auth_jwt import get_current_user
+from catalog_hooks import market_saved
+from fast_json import rows_response
 
 
 router = APIRouter(prefix="/business", tags=["business"])
@@ -85,8 +87,8 @@ def list_all_businesses(
     if not _is_admin(user):
         raise HTTPException(status_code=403, detail="forbidden")
 
-    items = db.query(Business).all()
-    return [serialize_business(b) for b in items]
+    items = db.query(*BUSINESS_COLUMNS).all()
+    return rows_response(BUSINESS_FIELDS, items)
 
 
 # =====================================================
@@ -123,11 +125,11 @@ def my_business(db: Session = Depends(get_db), user=Depends(get_current_user)):
 
     # ✅ admin: vê tudo (útil para testes)
     if _is_admin(user):
-        items = db.query(Business).all()
-        return [serialize_business(b) for b in items]
+        items = db.query(*BUSINESS_COLUMNS).all()
+        return rows_response(BUSINESS_FIELDS, items)
 
-    items = db.query(Business).filter(Business.ownerId == uid).all()
-    return [serialize_business(b) for b in items]
+    items = db.query(*BUSINESS_COLUMNS).filter(Business.ownerId == uid).all()
+    return rows_response(BUSINESS_FIELDS, items)
 
 
 # =====================================================
@@ -211,14 +213,14 @@ def list_my_markets(
         if not _is_admin(user) and b.ownerId != uid:
             raise HTTPException(status_code=403, detail="forbidden")
 
-        items = db.query(Market).filter(Market.businessId == businessId).all()
-        return [serialize_market(m) for m in items]
+        items = db.query(*MARKET_COLUMNS).filter(Market.businessId == businessId).all()
+        return rows_response(MARKET_FIELDS, items)
 
     # sem businessId:
     # ✅ admin: lista tudo
     if _is_admin(user):
-        items = db.query(Market).all()
-        return [serialize_market(m) for m in items]
+        items = db.query(*MARKET_COLUMNS).all()
+        return rows_response(MARKET_FIELDS, items)
 
     # usuário normal: pega das empresas do user
     my_business_ids = [
@@ -227,8 +229,8 @@ def list_my_markets(
     if not my_business_ids:
         return []
 
-    items = db.query(Market).filter(Market.businessId.in_(my_business_ids)).all()
-    return [serialize_market(m) for m in items]
+    items = db.query(*MARKET_COLUMNS).filter(Market.businessId.in_(my_business_ids)).all()
+    return rows_response(MARKET_FIELDS, items)
 
 
 # =====================================================
@@ -275,6 +277,7 @@ def create_market(payload: dict, db: Session = Depends(get_db), user=Depends(get
     db.add(m)
     db.commit()
     db.refresh(m)
+    market_saved(m)
     return serialize_market(m)
 
 
@@ -312,46 +315,29 @@ def update_market(market_id: str, payload: dict, db: Session = Depends(get_db),
 
     db.commit()
     db.refresh(m)
+    market_saved(m)
     return serialize_market(m)
 
 
 # =====================================================
 # SERIALIZERS (INALTERADOS)
 # =====================================================
+# ✅ NOVO: listas usam só essas colunas (tuplas) e serializam direto com orjson
+# (isVerified é NOT NULL, então a tupla já vem com bool)
+BUSINESS_FIELDS = (
+    "id", "ownerId", "name", "category", "contactEmail", "phone", "address", "city",
+    "state", "zipCode", "cnpj", "inscricaoEstadual", "isVerified",
+)
+BUSINESS_COLUMNS = tuple(getattr(Business, f) for f in BUSINESS_FIELDS)
+
+
 def serialize_business(b: Business):
     if not b:
         return None
-    return {
-        "id": b.id,
-        "ownerId": b.ownerId,
-        "name": b.name,
-        "category": b.category,
-        "contactEmail": b.contactEmail,
-        "phone": b.phone,
-        "address": b.address,
-        "city": b.city,
-        "state": b.state,
-        "zipCode": b.zipCode,
-        "cnpj": b.cnpj,
-        "inscricaoEstadual": b.inscricaoEstadual,
-        "isVerified": bool(b.isVerified),
-    }
+    out = {f: getattr(b, f) for f in BUSINESS_FIELDS}
+    out["isVerified"] = bool(b.isVerified)
+    return out
 
 
 def serialize_market(m: Market):
-    return {
-        "id": m.id,
-        "businessId": m.businessId,
-        "name": m.name,
-        "categorySlug": m.categorySlug,
-        "addressLine": m.addressLine,
-        "city": m.city,
-        "state": m.state,
-        "zipCode": m.zipCode,
-        "phone": m.phone,
-        "email": m.email,
-        "cnpj": m.cnpj,
-        "inscricaoEstadual": m.inscricaoEstadual,
-        "latitude": m.latitude,
-        "longitude": m.longitude,
-    }
+    return {f: getattr(m, f) for f in MARKET_FIELDS}
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+
+from catalog_snapshot import build_if_changed, latest_snapshot, snapshot_path
+
+router = APIRouter(prefix="/catalog", tags=["Catalog"])
+
+# arquivo versionado nunca muda: CDN / navegador podem guardar por 1 ano
+SNAPSHOT_FILE_CACHE = "public, max-age=31536000, immutable"
+
+
+# ✅ NOVO: manifesto do snapshot mais novo (pequeno, sempre revalidado)
+# GET /api/catalog/snapshot -> {version, url, bytes, generatedAt, syncSince}
+# Cold start: baixa `url` (catálogo inteiro, gzip) e depois GET /api/sync?since=<syncSince>
+@router.get("/snapshot")
+async def catalog_snapshot_manifest():
+    snap = latest_snapshot()
+    if snap is None:
+        # primeiro acesso antes da thread gerar: gera agora (só uma vez, tem lock)
+        snap = await run_in_threadpool(build_if_changed)
+        if snap is None:
+            raise HTTPException(status_code=503, detail="snapshot indisponível")
+
+    return {
+        "version": snap["version"],
+        "url": f"/api/catalog/snapshot/{snap['version']}.json.gz",
+        "bytes": snap["bytes"],
+        "generatedAt": snap["generatedAt"],
+        "syncSince": snap["version"],
+    }
+
+
+# ✅ NOVO: o arquivo em si (FileResponse = sendfile, sem passar os bytes pelo Python)
+@router.get("/snapshot/{version}.json.gz")
+def catalog_snapshot_file(version: int):
+    path = snapshot_path(version)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="snapshot não encontrado (pegue a versão atual em /api/catalog/snapshot)")
+
+    return FileResponse(
+        path,
+        media_type="application/json",
+        headers={
+            # já está em gzip: o navegador descompacta sozinho no fetch()
+            "Content-Encoding": "gzip",
+            "Cache-Control": SNAPSHOT_FILE_CACHE,
+        },
+    )
@@ -0,0 +1,320 @@
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from typing import List, Optional
+import math
+import time
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import numpy as np
+
+from db import get_db
+from models import Market
+from price_matrix import get_price_matrix
+from geo_index import get_geo_index
+
+router = APIRouter(prefix="/compare", tags=["Compare"])
+
+
+# ---------- Schemas ----------
+class BasketItemIn(BaseModel):
+    productId: str
+    quantity: float = Field(default=1, gt=0)
+
+
+class BasketIn(BaseModel):
+    items: List[BasketItemIn] = Field(min_length=1, max_length=500)
+    # quantos mercados devolver (ranking: menos itens faltando, depois menor total)
+    limit: int = Field(default=50, ge=1, le=500)
+
+
+class SplitBasketIn(BasketIn):
+    # no máximo k lojas diferentes
+    k: int = Field(default=2, ge=1, le=5)
+    # localização do usuário (opcional): só considera mercados dentro do raio
+    lat: Optional[float] = Field(default=None, ge=-90, le=90)
+    lng: Optional[float] = Field(default=None, ge=-180, le=180)
+    radiusKm: float = Field(default=10, gt=0, le=200)
+    maxCandidates: int = Field(default=25, ge=1, le=200)
+    timeBudgetMs: int = Field(default=250, ge=10, le=2000)
+
+
+def _merge_items(items: List[BasketItemIn]):
+    # mesmo produto repetido na lista -> soma as quantidades
+    qty_by_product = {}
+    for it in items:
+        pid = it.productId.strip()
+        if not pid:
+            continue
+        qty_by_product[pid] = qty_by_product.get(pid, 0.0) + float(it.quantity)
+    return list(qty_by_product.keys()), np.array(list(qty_by_product.values()), dtype=np.float64)
+
+
+def _market_info(db: Session, market_ids: List[str]) -> dict:
+    if not market_ids:
+        return {}
+    rows = db.execute(
+        select(Market.id, Market.name, Market.categorySlug, Market.city, Market.state)
+        .where(Market.id.in_(market_ids))
+    ).all()
+    return {r[0]: {"name": r[1], "categorySlug": r[2], "city": r[3], "state": r[4]} for r in rows}
+
+
+# ---------- BASKET ----------
+@router.post("/basket")
+def compare_basket(payload: BasketIn, db: Session = Depends(get_db)):
+    """
+    Total da cesta em cada mercado, itens faltando e economia vs o mercado mais caro.
+    Calculado de uma vez para todos os mercados (matriz em memória, sem SQL de preços).
+    """
+    product_ids, qty = _merge_items(payload.items)
+    if not product_ids:
+        raise HTTPException(status_code=400, detail="items vazio")
+
+    pm = get_price_matrix(db)
+    block = pm.basket_block(product_ids)  # mercados × produtos (NaN = sem preço)
+
+    present = ~np.isnan(block)
+    totals = np.where(present, block, 0.0) @ qty
+    missing_count = len(product_ids) - present.sum(axis=1)
+
+    # só mercados que têm pelo menos 1 item da cesta
+    candidates = np.flatnonzero(present.any(axis=1))
+    if candidates.size == 0:
+        return {"items": len(product_ids), "mostExpensiveTotal": None, "markets": []}
+
+    # referência da economia: mercado mais caro entre os que têm a cesta completa
+    complete = candidates[missing_count[candidates] == 0]
+    ref_pool = complete if complete.size else candidates
+    most_expensive_total = float(totals[ref_pool].max())
+
+    order = candidates[np.lexsort((totals[candidates], missing_count[candidates]))]
+    top = order[: payload.limit]
+
+    info = _market_info(db, [pm.market_ids[i] for i in top])
+    products = np.array(product_ids, dtype=object)
+
+    markets = []
+    for i in top:
+        market_id = pm.market_ids[i]
+        total = round(float(totals[i]), 2)
+        markets.append({
+            "marketId": market_id,
+            **info.get(market_id, {"name": None}),
+            "total": total,
+            "missingCount": int(missing_count[i]),
+            "missing": products[~present[i]].tolist(),
+            "savings": round(most_expensive_total - total, 2),
+        })
+
+    return {
+        "items": len(product_ids),
+        "mostExpensiveTotal": round(most_expensive_total, 2),
+        "completeMarkets": int(complete.size),
+        "markets": markets,
+    }
+
+
+# ---------- SPLIT BASKET (até k lojas) ----------
+# preço "infinito" para item que a loja não tem (mantém a soma em float e o mínimo funcionando)
+MISSING_COST = 1e9
+
+
+# acima disso nem tenta a busca exata (vai direto da heurística)
+SPLIT_EXACT_MAX_COMBOS = 200_000
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+def _markets_within(db: Session, pm, lat: float, lng: float, radius_km: float):
+    """Índices (na matriz) dos mercados dentro do raio + distância em km de cada um."""
+    ids, dist = get_geo_index(db).nearby_ids(lat, lng, radius_km)
+    idx, dists = [], {}
+    for market_id, d in zip(ids, dist.tolist()):
+        i = pm.market_index.get(market_id)
+        if i is not None:
+            idx.append(i)
+            dists[i] = d
+    return np.array(idx, dtype=np.int64), dists
+
+
+def _split_greedy(costs: np.ndarray, k: int, deadline: float):
+    """Adiciona a loja que mais reduz o total; depois tenta trocas 1-a-1 (busca local)."""
+    n, m = costs.shape
+    chosen = []
+    cur = np.full(m, MISSING_COST)
+    cur_total = float(cur.sum())
+
+    for _ in range(min(k, n)):
+        totals = np.minimum(costs, cur).sum(axis=1)
+        totals[chosen] = np.inf
+        i = int(np.argmin(totals))
+        if totals[i] >= cur_total:
+            break
+        chosen.append(i)
+        cur = np.minimum(cur, costs[i])
+        cur_total = float(totals[i])
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for pos in range(len(chosen)):
+            others = [c for j, c in enumerate(chosen) if j != pos]
+            base = costs[others].min(axis=0) if others else np.full(m, MISSING_COST)
+            totals = np.minimum(costs, base).sum(axis=1)
+            totals[chosen] = np.inf
+            i = int(np.argmin(totals))
+            if totals[i] < cur_total - 1e-9:
+                chosen[pos] = i
+                cur_total = float(totals[i])
+                improved = True
+
+    return cur_total, chosen
+
+
+def _split_branch_and_bound(costs: np.ndarray, k: int, best_total: float, best_set: list, deadline: float):
+    """
+    Busca exata sobre combinações de até k lojas, com poda por limite inferior:
+    LB = soma do mínimo entre (lojas já escolhidas, todas as lojas que ainda podem entrar).
+    Lança _BudgetExceeded se passar do deadline (fica valendo a melhor solução já achada).
+    """
+    n, m = costs.shape
+    order = np.argsort(costs.sum(axis=1))
+    costs = costs[order]
+
+    suffix_min = np.full((n + 1, m), MISSING_COST)
+    for i in range(n - 1, -1, -1):
+        suffix_min[i] = np.minimum(suffix_min[i + 1], costs[i])
+
+    state = {"total": best_total, "set": [int(np.flatnonzero(order == c)[0]) for c in best_set]}
+    chosen = []
+
+    def dfs(start: int, cur: np.ndarray):
+        if time.perf_counter() > deadline:
+            raise _BudgetExceeded()
+        for i in range(start, n):
+            # suffix_min só cresce com i: se o limite já não melhora, nenhum i seguinte melhora
+            if np.minimum(cur, suffix_min[i]).sum() >= state["total"] - 1e-9:
+                break
+            new = np.minimum(cur, costs[i])
+            chosen.append(i)
+            total = float(new.sum())
+            if total < state["total"] - 1e-9:
+                state["total"], state["set"] = total, list(chosen)
+            if len(chosen) < k:
+                dfs(i + 1, new)
+            chosen.pop()
+
+    exact = True
+    try:
+        dfs(0, np.full(m, MISSING_COST))
+    except _BudgetExceeded:
+        exact = False
+
+    return state["total"], [int(order[i]) for i in state["set"]], exact
+
+
+@router.post("/split")
+def compare_split_basket(payload: SplitBasketIn, db: Session = Depends(get_db)):
+    """
+    Forma mais barata de comprar a lista usando no máximo k lojas.
+    - candidatos: mercados no raio (se lat/lng) -> mais baratos por item + melhores no geral
+    - k pequeno: branch and bound exato (com orçamento de tempo)
+    - k grande / tempo esgotado: guloso + trocas (heurística)
+    """
+    started = time.perf_counter()
+    deadline = started + payload.timeBudgetMs / 1000.0
+
+    product_ids, qty = _merge_items(payload.items)
+    if not product_ids:
+        raise HTTPException(status_code=400, detail="items vazio")
+
+    pm = get_price_matrix(db)
+    block = pm.basket_block(product_ids)
+
+    distances = {}
+    if payload.lat is not None and payload.lng is not None:
+        pool, distances = _markets_within(db, pm, payload.lat, payload.lng, payload.radiusKm)
+    else:
+        pool = np.arange(pm.n_markets)
+
+    present = ~np.isnan(block[pool]) if pool.size else np.zeros((0, len(product_ids)), dtype=bool)
+    pool = pool[present.any(axis=1)] if pool.size else pool
+    if pool.size == 0:
+        return {"k": payload.k, "total": None, "exact": True, "stores": [], "missing": product_ids}
+
+    # custo por (mercado, item) já multiplicado pela quantidade
+    sub = block[pool]
+    costs = np.where(np.isnan(sub), MISSING_COST, sub * qty)
+
+    # itens que nenhum candidato tem ficam de fora da otimização
+    available = (costs < MISSING_COST).any(axis=0)
+    costs = costs[:, available]
+
+    # seleção de candidatos: o mais barato de cada item + ranking geral (cobertura, total)
+    missing_count = (costs >= MISSING_COST).sum(axis=1)
+    totals = np.where(costs >= MISSING_COST, 0.0, costs).sum(axis=1)
+    ranked = np.lexsort((totals, missing_count))
+    picked = list(dict.fromkeys(np.argmin(costs, axis=0).tolist()))[: payload.maxCandidates]
+    for i in ranked.tolist():
+        if len(picked) >= payload.maxCandidates:
+            break
+        if i not in picked:
+            picked.append(i)
+    cand = np.array(picked)
+    cand_costs = costs[cand]
+
+    best_total, best_set = _split_greedy(cand_costs, payload.k, deadline)
+    exact = False
+    n_combos = sum(math.comb(len(cand), r) for r in range(1, min(payload.k, len(cand)) + 1))
+    if n_combos <= SPLIT_EXACT_MAX_COMBOS:
+        best_total, best_set, exact = _split_branch_and_bound(cand_costs, payload.k, best_total, best_set, deadline)
+
+    # monta a resposta: cada item vai para a loja escolhida mais barata
+    chosen_rows = cand[best_set]
+    item_ids = [pid for pid, ok in zip(product_ids, available) if ok]
+    item_qty = qty[available]
+    assign = np.argmin(costs[chosen_rows], axis=0)
+
+    market_ids = [pm.market_ids[int(pool[r])] for r in chosen_rows]
+    info = _market_info(db, market_ids)
+
+    stores = []
+    missing = [pid for pid, ok in zip(product_ids, available) if not ok]
+    for s_pos, r in enumerate(chosen_rows):
+        market_idx = int(pool[r])
+        items = []
+        for j in np.flatnonzero(assign == s_pos):
+            cost = costs[r, j]
+            if cost >= MISSING_COST:
+                missing.append(item_ids[j])
+                continue
+            items.append({
+                "productId": item_ids[j],
+                "quantity": float(item_qty[j]),
+                "price": round(float(block[market_idx, product_ids.index(item_ids[j])]), 2),
+                "subtotal": round(float(cost), 2),
+            })
+        if not items:
+            continue
+        market_id = pm.market_ids[market_idx]
+        stores.append({
+            "marketId": market_id,
+            **info.get(market_id, {"name": None}),
+            "distanceKm": round(distances[market_idx], 2) if market_idx in distances else None,
+            "subtotal": round(sum(it["subtotal"] for it in items), 2),
+            "items": items,
+        })
+
+    total = round(sum(st["subtotal"] for st in stores), 2)
+    return {
+        "k": payload.k,
+        "total": total,
+        "exact": exact,
+        "candidates": int(len(cand)),
+        "stores": stores,
+        "missing": missing,
+        "elapsedMs": round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -1,11 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, null, select, tuple_
 from sqlalchemy.orm import Session
+import numpy as np
+import orjson
+import time
 import uuid
 
-from db import get_db
-from models import Product, Market, Price
+from db import get_db, SessionLocal
+from bulk_ingest import (
+    BULK_BATCH_SIZE,
+    BULK_MAX_ERRORS,
+    chunked,
+    clean_str,
+    detect_bulk_format,
+    iter_bulk_records,
+    parse_price_value,
+    upsert_insert,
+)
+from models import Product, Market, Price, MARKET_COLUMNS, MARKET_FIELDS
+from geo_index import bounding_box, get_geo_index, haversine_km
+from price_stats import get_price_stats
+from search_index import get_product_search
+from autocomplete import get_autocomplete
+from catalog_hooks import catalog_etag, market_saved, prices_saved, products_saved
+from price_history import record_price_changes, to_cents
+from price_stream import price_hub, sse_events
+from response_cache import response_cache
+from fast_json import json_bytes_response, rows_json, rows_response
+from sync_log import reserve_seq, table_version
 
 router = APIRouter(prefix="/api", tags=["Data"])
 
@@ -58,11 +84,137 @@ class PriceOut(PriceIn):
     id: int
 
 
+# ✅ NOVO: caminho rápido das listas — seleciona só as colunas (tuplas) e serializa com
+# orjson (fast_json), sem montar objeto ORM nem revalidar com Pydantic.
+# As chaves seguem ProductOut / MarketOut / PriceOut (mesmo JSON de antes).
+_PRODUCT_FIELDS = ("id", "name", "unit")
+_PRODUCT_COLUMNS = (Product.id, Product.name, Product.unit)
+
+# mesmas colunas de models.MARKET_FIELDS + "category" (MarketOut tem, a tabela não)
+_MARKET_FIELDS = (*MARKET_FIELDS, "category")
+_MARKET_COLUMNS = (*MARKET_COLUMNS, null().label("category"))
+
+_PRICE_FIELDS = ("marketId", "productId", "price", "id")
+_PRICE_COLUMNS = (Price.marketId, Price.productId, Price.price, Price.id)
+
+
+def _json_response(data: bytes, etag: Optional[str] = None) -> Response:
+    # no-cache = o navegador pode guardar, mas revalida sempre (If-None-Match -> 304 barato)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"} if etag else None
+    return json_bytes_response(data, headers=headers)
+
+
+# ---------- ETag ----------
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # lista "a", "b" ; compara ignorando o prefixo W/ (RFC 9110: comparação fraca no If-None-Match)
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+# ---------- BUSCA POR IDS ----------
+# ✅ NOVO: ?ids=a,b,c (GET da lista) -> [item, ...] na ordem pedida (mesmo formato da lista)
+#          {"ids": [...]} (POST .../lookup) -> {id: item}
+# 1 SELECT ... IN por lote de LOOKUP_CHUNK ids (limite de parâmetros do SQLite/Postgres)
+LOOKUP_CHUNK = 500
+LOOKUP_MAX_IDS = 5000
+
+
+class IdsIn(BaseModel):
+    ids: List[str]
+
+
+class PriceIdsIn(BaseModel):
+    ids: List[int]
+
+
+def _parse_ids(raw: str) -> List[str]:
+    return [x.strip() for x in raw.split(",") if x.strip()]
+
+
+def _lookup_rows(db: Session, fields, columns, key_col, ids: list) -> dict:
+    """{id: linha} dos ids encontrados, na ordem pedida."""
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > LOOKUP_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"máximo de {LOOKUP_MAX_IDS} ids por chamada")
+
+    key_i = fields.index(key_col.key)
+    found = {}
+    for chunk in chunked(ids, LOOKUP_CHUNK):
+        for r in db.execute(select(*columns).where(key_col.in_(chunk))):
+            found[r[key_i]] = r
+    return {str(i): found[i] for i in ids if i in found}
+
+
+def _lookup_list_response(db: Session, fields, columns, key_col, ids: list) -> Response:
+    return rows_response(fields, _lookup_rows(db, fields, columns, key_col, ids).values())
+
+
+def _lookup_response(db: Session, fields, columns, key_col, ids: list) -> Response:
+    found = _lookup_rows(db, fields, columns, key_col, ids)
+    return json_bytes_response(orjson.dumps({k: dict(zip(fields, r)) for k, r in found.items()}))
+
+
 # ---------- PRODUCTS ----------
 @router.get("/products", response_model=List[ProductOut])
-def list_products(db: Session = Depends(get_db)):
-    rows = db.query(Product).order_by(Product.name.asc()).all()
-    return rows
+def list_products(request: Request, ids: Optional[str] = None, db: Session = Depends(get_db)):
+    if ids is not None:
+        return _lookup_list_response(db, _PRODUCT_FIELDS, _PRODUCT_COLUMNS, Product.id, _parse_ids(ids))
+
+    # ✅ NOVO: ETag = versão da tabela (1 leitura de índice); 304 sai sem montar a lista
+    # (versão lida ANTES da query: se mudar no meio, o próximo GET baixa de novo)
+    version = table_version(db, "products")
+    etag = catalog_etag("products", version)
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+
+    # ✅ NOVO: lista pronta em bytes no cache (invalidada por products_saved; entrada de
+    # outra versão da tabela, gravada antes de uma escrita em outro worker, é miss)
+    data = response_cache.get_or_fill(
+        ("products",),
+        lambda: rows_json(_PRODUCT_FIELDS, db.execute(select(*_PRODUCT_COLUMNS).order_by(Product.name.asc()))),
+        version,
+    )
+    return _json_response(data, etag)
+
+
+@router.post("/products/lookup", response_model=Dict[str, ProductOut])
+def lookup_products(payload: IdsIn, db: Session = Depends(get_db)):
+    return _lookup_response(db, _PRODUCT_FIELDS, _PRODUCT_COLUMNS, Product.id, payload.ids)
+
+
+# ✅ NOVO: busca por nome (sem acento / plural), servida do índice em memória
+@router.get("/products/search")
+def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    return get_product_search(db).search(q, limit=limit)
+
+
+# ✅ NOVO: autocomplete por prefixo (produtos e mercados), ordenado por popularidade
+@router.get("/autocomplete")
+def autocomplete_names(
+    q: str = Query(..., min_length=1, max_length=100),
+    kind: Optional[str] = Query(None, pattern="^(product|market)$"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+):
+    return get_autocomplete(db).complete(q, kind=kind, limit=limit)
 
 
 @router.post("/products", response_model=ProductOut)
@@ -73,26 +225,128 @@ def create_or_update_product(payload: ProductIn, db: Session = Depends(get_db)):
         existing.unit = payload.unit
         db.commit()
         db.refresh(existing)
+        products_saved([{"id": existing.id, "name": existing.name, "unit": existing.unit}])
         return existing
 
     row = Product(id=payload.id, name=payload.name, unit=payload.unit)
     db.add(row)
     db.commit()
     db.refresh(row)
+    products_saved([{"id": row.id, "name": row.name, "unit": row.unit}])
     return row
 
 
+# ✅ NOVO: min / max / média / mediana / nº de mercados do produto (geral e, se pedir,
+# na cidade / estado), mantidos em memória a cada gravação de preço
+# GET /api/products/{id}/stats?city=&state=  (city exige state: nomes de cidade se repetem entre estados)
+@router.get("/products/{product_id}/stats")
+def product_price_stats(
+    product_id: str,
+    city: Optional[str] = None,
+    state: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    if city and not state:
+        raise HTTPException(status_code=400, detail="city exige state")
+    out = get_price_stats(db).summary(product_id, city=city, state=state)
+    if out["overall"] is None and not db.query(Product.id).filter(Product.id == product_id).first():
+        raise HTTPException(status_code=404, detail="produto não encontrado")
+    return out
+
+
+# ✅ NOVO: "onde está mais barato" — top-N mercados por preço, com dados do mercado no
+# mesmo SELECT (JOIN), sem N+1. Índice (productId, price) entrega já ordenado.
+# GET /api/products/{id}/cheapest?limit=10&lat=&lng=&radius=5
+CHEAPEST_SCAN_CHUNK = 200
+
+_CHEAPEST_MARKET_FIELDS = ("id", "name", "categorySlug", "addressLine", "city", "state", "latitude", "longitude")
+_CHEAPEST_MARKET_COLUMNS = tuple(getattr(Market, f) for f in _CHEAPEST_MARKET_FIELDS)
+
+
+@router.get("/products/{product_id}/cheapest")
+def cheapest_markets(
+    product_id: str,
+    limit: int = Query(10, ge=1, le=100),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lng: Optional[float] = Query(None, ge=-180, le=180),
+    radius: float = Query(10, gt=0, le=100, description="raio em km (só com lat/lng)"),
+    db: Session = Depends(get_db),
+):
+    if (lat is None) != (lng is None):
+        raise HTTPException(status_code=400, detail="informe lat e lng juntos")
+
+    stmt = (
+        select(Price.id, Price.price, *_CHEAPEST_MARKET_COLUMNS)
+        .join(Market, Market.id == Price.marketId)
+        .where(Price.productId == product_id)
+        .order_by(Price.price.asc(), Price.id.asc())
+    )
+
+    def item(r, distance=None):
+        out = {"priceId": r[0], "price": r[1], "market": dict(zip(_CHEAPEST_MARKET_FIELDS, r[2:]))}
+        if distance is not None:
+            out["distanceKm"] = round(float(distance), 3)
+        return out
+
+    items = []
+    if lat is None:
+        items = [item(r) for r in db.execute(stmt.limit(limit))]
+    else:
+        # caixa lat/lng no SQL (corta quase tudo) + haversine exato aqui, lendo em lotes
+        # na ordem de preço até juntar `limit` dentro do raio
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius)
+        stmt = stmt.where(
+            Market.latitude.between(min_lat, max_lat),
+            Market.longitude.between(min_lng, max_lng),
+        )
+        result = db.execute(stmt.execution_options(yield_per=CHEAPEST_SCAN_CHUNK))
+        lat_i = 2 + _CHEAPEST_MARKET_FIELDS.index("latitude")
+        lng_i = 2 + _CHEAPEST_MARKET_FIELDS.index("longitude")
+        for rows in result.partitions():
+            dist = haversine_km(lat, lng, np.array([r[lat_i] for r in rows]), np.array([r[lng_i] for r in rows]))
+            for r, d in zip(rows, dist):
+                if d <= radius:
+                    items.append(item(r, d))
+                    if len(items) >= limit:
+                        break
+            if len(items) >= limit:
+                break
+        result.close()
+
+    if not items and not db.query(Product.id).filter(Product.id == product_id).first():
+        raise HTTPException(status_code=404, detail="produto não encontrado")
+
+    return {"productId": product_id, "items": items}
+
+
 # ---------- MARKETS ----------
 @router.get("/markets", response_model=List[MarketOut])
 def list_markets(
+    request: Request,
     businessId: Optional[str] = None,
+    ids: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    q = db.query(Market)
-    if businessId:
-        q = q.filter(Market.businessId == businessId)
-    rows = q.order_by(Market.name.asc()).all()
-    return rows
+    if ids is not None:
+        return _lookup_list_response(db, _MARKET_FIELDS, _MARKET_COLUMNS, Market.id, _parse_ids(ids))
+
+    version = table_version(db, "markets")
+    etag = catalog_etag("markets", version)
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+
+    def load() -> bytes:
+        stmt = select(*_MARKET_COLUMNS)
+        if businessId:
+            stmt = stmt.where(Market.businessId == businessId)
+        return rows_json(_MARKET_FIELDS, db.execute(stmt.order_by(Market.name.asc())))
+
+    return _json_response(response_cache.get_or_fill(("markets", businessId or None), load, version), etag)
+
+
+@router.post("/markets/lookup", response_model=Dict[str, MarketOut])
+def lookup_markets(payload: IdsIn, db: Session = Depends(get_db)):
+    return _lookup_response(db, _MARKET_FIELDS, _MARKET_COLUMNS, Market.id, payload.ids)
 
 
 @router.post("/markets", response_model=MarketOut)
@@ -101,9 +355,9 @@ def create_market(payload: MarketIn, db: Session = Depends(get_db)):
         id=payload.id or str(uuid.uuid4()),
         businessId=payload.businessId,
         name=payload.name,
-        categorySlug=payload.categorySlug,
+        # Market não tem coluna "category": o front às vezes manda category no lugar de categorySlug
+        categorySlug=payload.categorySlug or payload.category,
 
-        category=payload.category,
         phone=payload.phone,
         email=payload.email,
 
@@ -121,9 +375,87 @@ def create_market(payload: MarketIn, db: Session = Depends(get_db)):
     db.add(row)
     db.commit()
     db.refresh(row)
+    market_saved(row)
     return row
 
 
+# ✅ NOVO: mercados próximos de um ponto (índice espacial em memória, sem varrer a tabela)
+@router.get("/markets/nearby")
+def list_nearby_markets(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(5, gt=0, le=100, description="raio em km"),
+    category: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    return get_geo_index(db).nearby(lat, lng, radius, category=category, limit=limit)
+
+
+# ✅ NOVO: mercado + todos os preços com nome/unidade do produto num SELECT só
+# (JOIN com projeção de colunas; total vem junto via COUNT(*) OVER ())
+# GET /api/markets/{id}/full?sort=name|-name|price|-price&limit=&offset=
+# (produto não tem categoria no banco: ordenação é por nome ou preço)
+_FULL_SORTS = {
+    "name": (Product.name.asc(), Price.id.asc()),
+    "-name": (Product.name.desc(), Price.id.asc()),
+    "price": (Price.price.asc(), Product.name.asc(), Price.id.asc()),
+    "-price": (Price.price.desc(), Product.name.asc(), Price.id.asc()),
+}
+
+
+@router.get("/markets/{market_id}/full")
+def market_full(
+    market_id: str,
+    sort: str = Query("name", pattern="^-?(name|price)$"),
+    limit: Optional[int] = Query(None, ge=1, le=5000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    stmt = (
+        select(
+            *MARKET_COLUMNS,
+            Price.id, Price.productId, Product.name, Product.unit, Price.price,
+            func.count(Price.id).over(),
+        )
+        .select_from(Market)
+        .outerjoin(Price, Price.marketId == Market.id)
+        .outerjoin(Product, Product.id == Price.productId)
+        .where(Market.id == market_id)
+        .order_by(*_FULL_SORTS[sort])
+    )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    if offset:
+        stmt = stmt.offset(offset)
+    rows = db.execute(stmt).all()
+
+    n = len(MARKET_FIELDS)
+    if rows:
+        market = dict(zip(MARKET_FIELDS, rows[0][:n]))
+        total = rows[0][-1]
+    else:
+        # offset além do fim: ainda precisa do mercado (e do total)
+        row = db.execute(select(*MARKET_COLUMNS).where(Market.id == market_id)).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Market não encontrado")
+        market = dict(zip(MARKET_FIELDS, row))
+        total = db.query(func.count(Price.id)).filter(Price.marketId == market_id).scalar()
+
+    prices = [
+        {"priceId": r[n], "productId": r[n + 1], "name": r[n + 2], "unit": r[n + 3], "price": r[n + 4]}
+        for r in rows
+        if r[n] is not None  # mercado sem nenhum preço: LEFT JOIN devolve 1 linha vazia
+    ]
+    return json_bytes_response(orjson.dumps({
+        "market": market,
+        "prices": prices,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+    }))
+
+
 @router.put("/markets/{market_id}", response_model=MarketOut)
 def update_market(market_id: str, payload: MarketIn, db: Session = Depends(get_db)):
     row = db.query(Market).filter(Market.id == market_id).first()
@@ -134,29 +466,121 @@ def update_market(market_id: str, payload: MarketIn, db: Session = Depends(get_d
     # não deixa trocar ID
     data.pop("id", None)
 
+    previous_business_id = row.businessId
     for k, v in data.items():
         setattr(row, k, v)
 
     db.commit()
     db.refresh(row)
+    market_saved(row, previous_business_id=previous_business_id)
     return row
 
 
 # ---------- PRICES ----------
+# ✅ NOVO: tamanho do lote lido do banco no modo streaming (cursor server-side)
+PRICES_STREAM_CHUNK = 1000
+
+
+def _stream_prices_ndjson(marketId: Optional[str], productId: Optional[str], cursor: Optional[int]):
+    """
+    Gera NDJSON (uma linha JSON por preço) lendo do banco em lotes via yield_per.
+    Usa sessão própria porque o gerador roda depois que a rota já retornou.
+    """
+    db = SessionLocal()
+    try:
+        stmt = select(Price.id, Price.marketId, Price.productId, Price.price)
+        if marketId:
+            stmt = stmt.where(Price.marketId == marketId)
+        if productId:
+            stmt = stmt.where(Price.productId == productId)
+        if cursor is not None:
+            stmt = stmt.where(Price.id < cursor)
+        stmt = stmt.order_by(Price.id.desc())
+
+        result = db.execute(stmt.execution_options(yield_per=PRICES_STREAM_CHUNK))
+        for rows in result.partitions():
+            yield b"".join(
+                orjson.dumps({"id": r[0], "marketId": r[1], "productId": r[2], "price": r[3]}) + b"\n"
+                for r in rows
+            )
+    finally:
+        db.close()
+
+
 @router.get("/prices", response_model=List[PriceOut])
 def list_prices(
     marketId: Optional[str] = None,
     productId: Optional[str] = None,
+    # ✅ NOVO: paginação por cursor (keyset em Price.id, ordem desc)
+    # - sem limit/cursor: comportamento antigo (lista completa)
+    # - com limit: devolve até `limit` itens e o próximo cursor em X-Next-Cursor
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, ge=1),
+    # ✅ NOVO: format=ndjson -> streaming linha a linha (memória constante)
+    format: Optional[str] = None,
+    # ✅ NOVO: ?ids=1,2,3 -> só esses preços (mapa {id: preço} em POST /prices/lookup)
+    ids: Optional[str] = None,
     db: Session = Depends(get_db),
 ):
-    q = db.query(Price)
+    if ids is not None:
+        try:
+            price_ids = [int(x) for x in _parse_ids(ids)]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids de preço devem ser inteiros")
+        return _lookup_list_response(db, _PRICE_FIELDS, _PRICE_COLUMNS, Price.id, price_ids)
+
+    if (format or "").lower() == "ndjson":
+        return StreamingResponse(
+            _stream_prices_ndjson(marketId, productId, cursor),
+            media_type="application/x-ndjson",
+        )
+
+    stmt = select(*_PRICE_COLUMNS)
     if marketId:
-        q = q.filter(Price.marketId == marketId)
+        stmt = stmt.where(Price.marketId == marketId)
     if productId:
-        q = q.filter(Price.productId == productId)
-
-    rows = q.order_by(Price.id.desc()).all()
-    return rows
+        stmt = stmt.where(Price.productId == productId)
+    if cursor is not None:
+        stmt = stmt.where(Price.id < cursor)
+
+    stmt = stmt.order_by(Price.id.desc())
+
+    # ✅ NOVO: lista filtrada (sem paginação) sai do cache de respostas;
+    # invalidada por par (mercado, produto) em prices_saved; escritas de outros workers
+    # aparecem em até RESPONSE_CACHE_TTL_SEC
+    if limit is None and cursor is None and (marketId or productId):
+        key = ("prices", marketId or None, productId or None)
+        return _json_response(response_cache.get_or_fill(key, lambda: rows_json(_PRICE_FIELDS, db.execute(stmt))))
+
+    if limit is None:
+        return rows_response(_PRICE_FIELDS, db.execute(stmt))
+
+    # busca 1 a mais só para saber se existe próxima página
+    rows = db.execute(stmt.limit(limit + 1)).all()
+    headers = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers = {"X-Next-Cursor": str(rows[-1].id)}
+    return rows_response(_PRICE_FIELDS, rows, headers=headers)
+
+
+@router.post("/prices/lookup", response_model=Dict[str, PriceOut])
+def lookup_prices(payload: PriceIdsIn, db: Session = Depends(get_db)):
+    return _lookup_response(db, _PRICE_FIELDS, _PRICE_COLUMNS, Price.id, payload.ids)
+
+
+# ✅ NOVO: mudanças de preço em tempo real (Server-Sent Events), no lugar de polling em /prices
+# GET /api/prices/stream?marketId=...&productId=...
+@router.get("/prices/stream")
+async def stream_price_changes(request: Request, marketId: Optional[str] = None, productId: Optional[str] = None):
+    sub = price_hub.subscribe(marketId, productId)
+    if sub is None:
+        raise HTTPException(status_code=503, detail="muitas conexões abertas, tente de novo")
+    return StreamingResponse(
+        sse_events(sub, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/prices", response_model=PriceOut)
@@ -175,13 +599,246 @@ def create_or_update_price(payload: PriceIn, db: Session = Depends(get_db)):
         .first()
     )
     if existing:
+        old_price = existing.price
+        changed = to_cents(old_price) != to_cents(payload.price)
         existing.price = payload.price
+        if changed:
+            record_price_changes(db, [{"priceId": existing.id, "price": payload.price}])
         db.commit()
         db.refresh(existing)
+        if changed:
+            prices_saved([{
+                "marketId": existing.marketId,
+                "productId": existing.productId,
+                "price": existing.price,
+                "oldPrice": old_price,
+            }])
         return existing
 
     row = Price(marketId=payload.marketId, productId=payload.productId, price=payload.price)
     db.add(row)
+    db.flush()  # garante row.id para o histórico (mesma transação)
+    record_price_changes(db, [{"priceId": row.id, "price": row.price}])
     db.commit()
     db.refresh(row)
+    prices_saved([{"marketId": row.marketId, "productId": row.productId, "price": row.price}])
     return row
+
+
+# ✅ NOVO: importação em lote de preços (CSV ou NDJSON)
+# - valida marketId/productId em lote (1 SELECT IN por lote)
+# - grava com INSERT ... ON CONFLICT (marketId, productId) DO UPDATE
+def _upsert_price_batch(db: Session, batch: list) -> Tuple[int, list]:
+    """
+    batch: [(linha, marketId, productId, price)]
+    Retorna (aceitos, rejeitados[{row, error}]).
+    """
+    market_ids = {b[1] for b in batch}
+    product_ids = {b[2] for b in batch}
+
+    found_markets = set(db.scalars(select(Market.id).where(Market.id.in_(market_ids))))
+    found_products = set(db.scalars(select(Product.id).where(Product.id.in_(product_ids))))
+
+    rejected = []
+    valid_rows = []
+    # dedup dentro do lote: última linha vence (ON CONFLICT não aceita a mesma chave 2x no mesmo comando)
+    rows_by_key = {}
+    for row_no, market_id, product_id, price in batch:
+        if market_id not in found_markets:
+            rejected.append({"row": row_no, "error": "marketId não encontrado"})
+            continue
+        if product_id not in found_products:
+            rejected.append({"row": row_no, "error": "productId não encontrado"})
+            continue
+        valid_rows.append(row_no)
+        rows_by_key[(market_id, product_id)] = {"marketId": market_id, "productId": product_id, "price": price}
+
+    rows = list(rows_by_key.values())
+    if rows:
+        stmt = upsert_insert(db, Price)
+        # só atualiza (e só devolve no RETURNING) quem é novo ou mudou de preço
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Price.marketId, Price.productId],
+            set_={"price": stmt.excluded.price, "changeSeq": stmt.excluded.changeSeq},
+            where=(Price.price != stmt.excluded.price),
+        ).returning(Price.id, Price.marketId, Price.productId, Price.price)
+        try:
+            # preço anterior de cada par (alertas precisam saber se o preço "cruzou" o alvo)
+            old_prices = {
+                (r[0], r[1]): r[2]
+                for r in db.execute(
+                    select(Price.marketId, Price.productId, Price.price)
+                    .where(tuple_(Price.marketId, Price.productId).in_(list(rows_by_key.keys())))
+                )
+            }
+
+            # ✅ NOVO: bloco da sequência de mudança (delta sync); quem não mudou só deixa um buraco
+            first_seq = reserve_seq(db, len(rows))
+            for i, r in enumerate(rows):
+                r["changeSeq"] = first_seq + i
+
+            changed = [
+                {"priceId": r[0], "marketId": r[1], "productId": r[2], "price": r[3], "oldPrice": old_prices.get((r[1], r[2]))}
+                for r in db.execute(stmt, rows)
+            ]
+            record_price_changes(db, changed)
+            db.commit()
+        except Exception as e:
+            # lotes anteriores já foram commitados: este lote inteiro vira rejeitado e a importação segue
+            db.rollback()
+            print("PRICES_BULK_BATCH_ERROR:", repr(e))
+            rejected.extend({"row": row_no, "error": "falha ao gravar lote"} for row_no in valid_rows)
+            return len(batch) - len(rejected), rejected
+        prices_saved(changed)
+
+    return len(batch) - len(rejected), rejected
+
+
+@router.post("/prices/bulk")
+async def bulk_upsert_prices(request: Request, format: Optional[str] = None):
+    """
+    Body CSV (cabeçalho marketId,productId,price) ou NDJSON ({"marketId","productId","price"} por linha).
+    Content-Type text/csv ou application/x-ndjson (ou ?format=csv|ndjson).
+    """
+    fmt = detect_bulk_format(request, format)
+    started = time.perf_counter()
+
+    accepted = 0
+    rejected_count = 0
+    errors = []
+
+    def _reject(items):
+        nonlocal rejected_count
+        rejected_count += len(items)
+        room = BULK_MAX_ERRORS - len(errors)
+        if room > 0:
+            errors.extend(items[:room])
+
+    db = SessionLocal()
+    try:
+        batch = []
+        async for row_no, rec, err in iter_bulk_records(request, fmt):
+            if err:
+                _reject([{"row": row_no, "error": err}])
+                continue
+
+            market_id = clean_str(rec.get("marketId"))
+            product_id = clean_str(rec.get("productId"))
+            price = parse_price_value(rec.get("price"))
+            if not market_id or not product_id:
+                _reject([{"row": row_no, "error": "marketId e productId são obrigatórios"}])
+                continue
+            if price is None:
+                _reject([{"row": row_no, "error": "price inválido"}])
+                continue
+
+            batch.append((row_no, market_id, product_id, price))
+            if len(batch) >= BULK_BATCH_SIZE:
+                ok, bad = await run_in_threadpool(_upsert_price_batch, db, batch)
+                accepted += ok
+                _reject(bad)
+                batch = []
+
+        if batch:
+            ok, bad = await run_in_threadpool(_upsert_price_batch, db, batch)
+            accepted += ok
+            _reject(bad)
+    finally:
+        db.close()
+
+    return {
+        "ok": True,
+        "format": fmt,
+        "accepted": accepted,
+        "rejected": rejected_count,
+        "errors": errors,
+        "elapsedMs": round((time.perf_counter() - started) * 1000, 1),
+        "rowsPerSecond": _rows_per_second(accepted + rejected_count, started),
+    }
+
+
+def _rows_per_second(total: int, started: float) -> float:
+    elapsed = time.perf_counter() - started
+    return round(total / elapsed, 1) if elapsed > 0 else float(total)
+
+
+# ✅ NOVO: importação em lote do catálogo de produtos (CSV ou NDJSON)
+# - cada lote é 1 transação (INSERT ... ON CONFLICT (id) DO UPDATE + commit)
+# - se um lote falhar, só as linhas dele são marcadas como rejeitadas
+def _upsert_product_batch(db: Session, batch: list) -> list:
+    """
+    batch: [(linha, id, name, unit)]
+    Retorna resultados por linha: {row, id, ok[, error]}.
+    """
+    rows_by_id = {}
+    for _, product_id, name, unit in batch:
+        rows_by_id[product_id] = {"id": product_id, "name": name, "unit": unit}
+
+    stmt = upsert_insert(db, Product)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Product.id],
+        set_={"name": stmt.excluded.name, "unit": stmt.excluded.unit, "changeSeq": stmt.excluded.changeSeq},
+    )
+    try:
+        # ✅ NOVO: sequência de mudança (delta sync) reservada na mesma transação
+        first_seq = reserve_seq(db, len(rows_by_id))
+        values = [dict(r, changeSeq=first_seq + i) for i, r in enumerate(rows_by_id.values())]
+        db.execute(stmt, values)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print("PRODUCTS_BULK_BATCH_ERROR:", repr(e))
+        return [{"row": row_no, "id": product_id, "ok": False, "error": "falha ao gravar lote"} for row_no, product_id, _, _ in batch]
+
+    products_saved(rows_by_id.values())
+
+    return [{"row": row_no, "id": product_id, "ok": True} for row_no, product_id, _, _ in batch]
+
+
+@router.post("/products/bulk")
+async def bulk_upsert_products(request: Request, format: Optional[str] = None):
+    """
+    Body CSV (cabeçalho id,name,unit) ou NDJSON ({"id","name","unit"} por linha).
+    Content-Type text/csv ou application/x-ndjson (ou ?format=csv|ndjson).
+    """
+    fmt = detect_bulk_format(request, format)
+    started = time.perf_counter()
+
+    results = []
+    batch = []
+
+    db = SessionLocal()
+    try:
+        async for row_no, rec, err in iter_bulk_records(request, fmt):
+            if err:
+                results.append({"row": row_no, "id": None, "ok": False, "error": err})
+                continue
+
+            product_id = clean_str(rec.get("id"))
+            name = clean_str(rec.get("name"))
+            if not product_id or not name:
+                results.append({"row": row_no, "id": product_id, "ok": False, "error": "id e name são obrigatórios"})
+                continue
+
+            batch.append((row_no, product_id, name, clean_str(rec.get("unit"))))
+            if len(batch) >= BULK_BATCH_SIZE:
+                results.extend(await run_in_threadpool(_upsert_product_batch, db, batch))
+                batch = []
+
+        if batch:
+            results.extend(await run_in_threadpool(_upsert_product_batch, db, batch))
+    finally:
+        db.close()
+
+    accepted = sum(1 for r in results if r["ok"])
+    results.sort(key=lambda r: r["row"])
+
+    return {
+        "ok": True,
+        "format": fmt,
+        "accepted": accepted,
+        "rejected": len(results) - accepted,
+        "elapsedMs": round((time.perf_counter() - started) * 1000, 1),
+        "rowsPerSecond": _rows_per_second(len(results), started),
+        "results": results,
+    }
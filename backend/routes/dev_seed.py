@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 from db import SessionLocal
 from models import Market  # se der erro aqui, me manda seu models.py que eu ajusto
+from catalog_hooks import market_saved
 
 router = APIRouter(prefix="/dev", tags=["Dev"])
 
@@ -36,6 +37,8 @@ def seed_markets():
 
     db.add_all(markets)
     db.commit()
+    for m in markets:
+        market_saved(m)
     db.close()
 
     return {"ok": True, "inserted": len(markets)}
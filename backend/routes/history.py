@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+from sqlalchemy.orm import Session
+
+from db import get_db
+from models import Price, Product
+from price_history import daily_series, price_id_for, product_daily_series
+
+router = APIRouter(prefix="/history", tags=["History"])
+
+
+# ✅ NOVO: histórico diário (min/max/último) de um produto em um mercado
+# GET /api/history/prices?marketId=...&productId=...&days=90
+@router.get("/prices")
+def price_history(
+    marketId: str,
+    productId: str,
+    days: int = Query(90, ge=1, le=365),
+    db: Session = Depends(get_db),
+):
+    price_id = price_id_for(db, productId, marketId)
+    if price_id is None:
+        raise HTTPException(status_code=404, detail="preço não encontrado")
+
+    current = db.query(Price.price).filter(Price.id == price_id).scalar()
+    return {
+        "marketId": marketId,
+        "productId": productId,
+        "current": current,
+        **daily_series(db, price_id, days),
+    }
+
+
+# ✅ NOVO: histórico diário do produto considerando todos os mercados
+# (min/max do dia entre os mercados + menor preço da janela: "menor preço em 90 dias")
+@router.get("/products/{product_id}")
+def product_price_history(
+    product_id: str,
+    days: int = Query(90, ge=1, le=365),
+    marketId: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    if not db.query(Product.id).filter(Product.id == product_id).first():
+        raise HTTPException(status_code=404, detail="produto não encontrado")
+
+    if marketId:
+        price_id = price_id_for(db, product_id, marketId)
+        series = daily_series(db, price_id, days) if price_id is not None else {"days": [], "lowest": None}
+    else:
+        series = product_daily_series(db, product_id, days)
+    return {
+        "productId": product_id,
+        **series,
+    }
@@ -3,8 +3,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from db import get_db
-from models import Market, Business
+from models import Market, Business, MARKET_COLUMNS, MARKET_FIELDS
 from auth_jwt import get_current_user
+from catalog_hooks import market_saved
+from fast_json import rows_response
 
 
 router = APIRouter(prefix="/markets", tags=["markets"])
@@ -56,7 +58,8 @@ def _is_admin(user) -> bool:
 
 @router.get("", operation_id="markets_list_markets")
 def list_markets(businessId: str | None = None, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    q = db.query(Market)
+    # ✅ NOVO: só as colunas do serialize_market (tuplas) -> orjson
+    q = db.query(*MARKET_COLUMNS)
 
     uid = _get_user_id(user)
     if not uid:
@@ -65,7 +68,7 @@ def list_markets(businessId: str | None = None, db: Session = Depends(get_db), u
     # ✅ admin pode ver tudo (se não passar businessId)
     if _is_admin(user) and not businessId:
         items = q.all()
-        return [serialize_market(m) for m in items]
+        return rows_response(MARKET_FIELDS, items)
 
     # se vier businessId, valida que é do usuário (ou admin)
     if businessId:
@@ -82,7 +85,7 @@ def list_markets(businessId: str | None = None, db: Session = Depends(get_db), u
         q = q.filter(Market.businessId.in_(my_business_ids)) if my_business_ids else q.filter(Market.id == "__none__")
 
     items = q.all()
-    return [serialize_market(m) for m in items]
+    return rows_response(MARKET_FIELDS, items)
 
 
 @router.post("", operation_id="markets_create_market")
@@ -126,6 +129,7 @@ def create_market(payload: dict, db: Session = Depends(get_db), user=Depends(get
     db.add(m)
     db.commit()
     db.refresh(m)
+    market_saved(m)
     return serialize_market(m)
 
 
@@ -159,23 +163,9 @@ def update_market(market_id: str, payload: dict, db: Session = Depends(get_db),
 
     db.commit()
     db.refresh(m)
+    market_saved(m)
     return serialize_market(m)
 
 
 def serialize_market(m: Market):
-    return {
-        "id": m.id,
-        "businessId": m.businessId,
-        "name": m.name,
-        "categorySlug": m.categorySlug,
-        "addressLine": m.addressLine,
-        "city": m.city,
-        "state": m.state,
-        "zipCode": m.zipCode,
-        "phone": m.phone,
-        "email": m.email,
-        "cnpj": m.cnpj,
-        "inscricaoEstadual": m.inscricaoEstadual,
-        "latitude": m.latitude,
-        "longitude": m.longitude,
-    }
+    return {f: getattr(m, f) for f in MARKET_FIELDS}
@@ -9,7 +9,7 @@ from sqlalchemy.orm import Session
 
 from db import get_db
 from models import User, Subscription
-from auth_jwt import get_current_user
+from auth_jwt import get_current_user, invalidate_user
 
 # ✅ AJUSTE (NÃO APAGA NADA): import seguro para não derrubar o deploy no Railway
 # Se mercadopago não estiver instalado/carregar errado, a API sobe e só as rotas billing retornam erro claro.
@@ -618,6 +618,7 @@ async def mp_webhook(request: Request, db: Session = Depends(get_db)):
                         user.plan = final_plan
 
                 db.commit()
+                invalidate_user(target_user_id)
             except Exception as e:
                 db.rollback()
                 return JSONResponse({"status": "db_update_error", "detail": str(e)}, status_code=200)
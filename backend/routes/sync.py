@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+import orjson
+
+from db import get_db
+from fast_json import json_bytes_response
+from sync_log import SYNC_DEFAULT_LIMIT, SYNC_MAX_LIMIT, changes_since
+
+router = APIRouter(prefix="/sync", tags=["Sync"])
+
+
+# ✅ NOVO: delta sync para o app offline
+# GET /api/sync?since=<cursor>  (since=0 ou ausente = carga completa, paginada por hasMore)
+# Resposta: {cursor, hasMore, products[], markets[], prices[], deleted{products[], markets[], prices[]}}
+# O cliente guarda `cursor` e chama de novo com since=cursor (repete enquanto hasMore=true).
+@router.get("")
+def sync_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(SYNC_DEFAULT_LIMIT, ge=1, le=SYNC_MAX_LIMIT),
+    db: Session = Depends(get_db),
+):
+    return json_bytes_response(orjson.dumps(changes_since(db, since, limit)), headers={"Cache-Control": "no-store"})
@@ -0,0 +1,266 @@
+# search_index.py
+"""
+Busca de produtos em memória (índice invertido + trigramas), sem LIKE '%x%' no banco.
+
+Normalização em português:
+- minúsculas + remove acentos ("Feijão" -> "feijao")
+- tira plural simples ("limões" -> "limao", "pães" -> "pao", "ovos" -> "ovo")
+
+Ranking por termo da busca: token igual > prefixo (usuário ainda digitando) > parecido (trigramas).
+create_or_update_product / importação em lote chamam upsert_product() depois do commit.
+Produtos gravados em OUTROS workers entram na recarga (index_reload.IndexReloader: quando a
+tabela products muda no banco), montada fora do lock e trocada de uma vez.
+"""
+import bisect
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from index_reload import IndexReloader
+from models import Product
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# (sufixo plural, troca) — ordem importa: mais específico primeiro
+_PLURAL_RULES = (
+    ("oes", "ao"),
+    ("aes", "ao"),
+    ("ais", "al"),
+    ("eis", "el"),
+    ("ois", "ol"),
+    ("uis", "ul"),
+    ("res", "r"),
+    ("zes", "z"),
+    ("ses", "s"),
+    ("ns", "m"),
+)
+
+SEARCH_EXACT_WEIGHT = 1.0
+SEARCH_PREFIX_WEIGHT = 0.8
+SEARCH_FUZZY_WEIGHT = 0.6
+SEARCH_FUZZY_MIN_SIM = 0.4
+SEARCH_MAX_EXPANSIONS = 200
+SEARCH_MAX_AGE_SEC = int(os.getenv("SEARCH_MAX_AGE_SEC", "3600"))
+
+
+def fold_accents(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def singularize(token: str) -> str:
+    if len(token) <= 3 or not token.endswith("s") or token.isdigit():
+        return token
+    for suffix, repl in _PLURAL_RULES:
+        if token.endswith(suffix) and len(token) > len(suffix):
+            return token[: -len(suffix)] + repl
+    return token[:-1]
+
+
+def raw_tokens(text: str) -> List[str]:
+    # sem acento e minúsculo, mas sem tirar plural (autocomplete precisa do prefixo literal)
+    return _TOKEN_RE.findall(fold_accents(text))
+
+
+def tokenize(text: str) -> List[str]:
+    return [singularize(t) for t in raw_tokens(text)]
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(tokenize(text))
+
+
+def _trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ProductSearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded_at: Optional[float] = None
+        self._replay: Optional[List[tuple]] = None
+        self._reset()
+
+    def _reset(self):
+        self._docs: Dict[str, Tuple[str, Optional[str], Tuple[str, ...]]] = {}  # id -> (name, unit, tokens)
+        self._postings: Dict[str, Set[str]] = {}  # token -> ids
+        self._tri: Dict[str, Set[str]] = {}  # trigrama -> tokens do vocabulário
+        self._sorted_vocab: List[str] = []
+        self._vocab_dirty = False
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def __len__(self):
+        return len(self._docs)
+
+    def load(self, db: Session):
+        """Monta o índice novo fora do lock e troca de uma vez: buscas nunca esperam o scan."""
+        stmt = select(Product.id, Product.name, Product.unit).execution_options(yield_per=5000)
+        with self._lock:
+            # escritas commitadas durante o scan podem não aparecer nele: guarda para reaplicar
+            self._replay = []
+        fresh = ProductSearchIndex()
+        try:
+            for rows in db.execute(stmt).partitions():
+                for product_id, name, unit in rows:
+                    fresh._put(product_id, name, unit)
+        except BaseException:
+            with self._lock:
+                self._replay = None
+            raise
+        with self._lock:
+            for product_id, name, unit in self._replay:
+                fresh._put(product_id, name, unit)
+            self._replay = None
+            self._docs, self._postings, self._tri = fresh._docs, fresh._postings, fresh._tri
+            self._sorted_vocab, self._vocab_dirty = fresh._sorted_vocab, True
+            self.loaded_at = time.monotonic()
+
+    # ---------- escrita ----------
+    def _add_token(self, token: str, product_id: str):
+        ids = self._postings.get(token)
+        if ids is None:
+            ids = self._postings[token] = set()
+            for tri in _trigrams(token):
+                self._tri.setdefault(tri, set()).add(token)
+            self._vocab_dirty = True
+        ids.add(product_id)
+
+    def _drop_token(self, token: str, product_id: str):
+        ids = self._postings.get(token)
+        if ids is None:
+            return
+        ids.discard(product_id)
+        if not ids:
+            del self._postings[token]
+            for tri in _trigrams(token):
+                bucket = self._tri.get(tri)
+                if bucket is not None:
+                    bucket.discard(token)
+                    if not bucket:
+                        del self._tri[tri]
+            self._vocab_dirty = True
+
+    def _put(self, product_id: str, name: str, unit: Optional[str]):
+        self._remove(product_id)
+        tokens = tuple(dict.fromkeys(tokenize(name)))
+        self._docs[product_id] = (name, unit, tokens)
+        for t in tokens:
+            self._add_token(t, product_id)
+
+    def _remove(self, product_id: str):
+        old = self._docs.pop(product_id, None)
+        if old is None:
+            return
+        for t in old[2]:
+            self._drop_token(t, product_id)
+
+    def upsert_product(self, product_id: str, name: str, unit: Optional[str] = None):
+        self.upsert_many([{"id": product_id, "name": name, "unit": unit}])
+
+    def upsert_many(self, rows: Iterable[dict]):
+        with self._lock:
+            if not self.loaded and self._replay is None:
+                return
+            for r in rows:
+                if self._replay is not None:
+                    self._replay.append((r["id"], r["name"], r.get("unit")))
+                if self.loaded:
+                    self._put(r["id"], r["name"], r.get("unit"))
+
+    # ---------- busca ----------
+    def _vocab(self) -> List[str]:
+        if self._vocab_dirty:
+            self._sorted_vocab = sorted(self._postings)
+            self._vocab_dirty = False
+        return self._sorted_vocab
+
+    def _expand(self, q_token: str, allow_prefix: bool) -> Dict[str, float]:
+        """Tokens do vocabulário que casam com o termo da busca -> peso."""
+        matches: Dict[str, float] = {}
+        if q_token in self._postings:
+            matches[q_token] = SEARCH_EXACT_WEIGHT
+
+        if allow_prefix and len(q_token) >= 2:
+            vocab = self._vocab()
+            i = bisect.bisect_left(vocab, q_token)
+            n = 0
+            while i < len(vocab) and vocab[i].startswith(q_token) and n < SEARCH_MAX_EXPANSIONS:
+                matches.setdefault(vocab[i], SEARCH_PREFIX_WEIGHT)
+                i += 1
+                n += 1
+
+        if len(q_token) >= 3:
+            q_tri = _trigrams(q_token)
+            overlap: Dict[str, int] = {}
+            for tri in q_tri:
+                for t in self._tri.get(tri, ()):
+                    overlap[t] = overlap.get(t, 0) + 1
+            for t, common in overlap.items():
+                if t in matches:
+                    continue
+                sim = common / (len(q_tri) + len(t) + 1 - common)
+                if sim >= SEARCH_FUZZY_MIN_SIM:
+                    matches[t] = SEARCH_FUZZY_WEIGHT * sim
+
+        return matches
+
+    def search(self, query: str, limit: int = 20) -> List[dict]:
+        q_tokens = list(dict.fromkeys(tokenize(query)))
+        if not q_tokens:
+            return []
+
+        with self._lock:
+            # por produto: [termos casados, score]
+            scores: Dict[str, List[float]] = {}
+            for pos, q_token in enumerate(q_tokens):
+                # prefixo só no último termo (é o que o usuário está digitando)
+                expansions = self._expand(q_token, allow_prefix=(pos == len(q_tokens) - 1))
+                best_for_doc: Dict[str, float] = {}
+                for token, weight in expansions.items():
+                    for product_id in self._postings.get(token, ()):
+                        if weight > best_for_doc.get(product_id, 0.0):
+                            best_for_doc[product_id] = weight
+                for product_id, weight in best_for_doc.items():
+                    acc = scores.get(product_id)
+                    if acc is None:
+                        scores[product_id] = [1, weight]
+                    else:
+                        acc[0] += 1
+                        acc[1] += weight
+
+            ranked = sorted(
+                scores.items(),
+                key=lambda kv: (-kv[1][0], -kv[1][1], len(self._docs[kv[0]][2]), self._docs[kv[0]][0]),
+            )[:limit]
+
+            out = []
+            for product_id, (matched, score) in ranked:
+                name, unit, _ = self._docs[product_id]
+                out.append({
+                    "id": product_id,
+                    "name": name,
+                    "unit": unit,
+                    "score": round(score / len(q_tokens), 3),
+                    "matchedAll": int(matched) == len(q_tokens),
+                })
+            return out
+
+
+product_search = ProductSearchIndex()
+_reloader = IndexReloader(product_search, SEARCH_MAX_AGE_SEC, tables=("products",))
+
+
+def get_product_search(db: Session) -> ProductSearchIndex:
+    """Carrega na primeira chamada; recarrega quando products muda (1 requisição, as outras seguem)."""
+    return _reloader.get(db)
@@ -0,0 +1,139 @@
+# sync_log.py
+"""
+Sequência de mudança para o delta sync (GET /api/sync?since=<cursor>).
+
+- toda linha nova/alterada de products, markets e prices recebe changeSeq = próximo número
+  de um contador único (tabela sync_counter, 1 linha)
+- linha apagada vira tombstone (sync_tombstones) com o seu próprio changeSeq
+- escrita pelo ORM: listener before_flush numera sozinho (rotas não precisam fazer nada)
+- escrita em Core (importação em lote): a rota reserva um bloco com reserve_seq() e manda
+  changeSeq junto dos valores
+
+O UPDATE no contador trava a linha até o commit, então números são entregues na ordem dos
+commits: o cursor devolvido (valor commitado do contador) nunca "pula" uma linha ainda em voo.
+"""
+from typing import Dict, List
+
+from sqlalchemy import event, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from db import SessionLocal
+from models import Market, Price, Product, SyncCounter, SyncTombstone
+
+
+SYNC_DEFAULT_LIMIT = 5000
+SYNC_MAX_LIMIT = 20000
+
+SYNC_ENTITIES = {
+    "products": Product,
+    "markets": Market,
+    "prices": Price,
+}
+_TRACKED = tuple(SYNC_ENTITIES.values())
+_counter = SyncCounter.__table__
+
+
+def reserve_seq(db: Session, n: int = 1) -> int:
+    """Reserva n números consecutivos (na transação atual) e devolve o primeiro."""
+    last = db.execute(
+        update(_counter).where(_counter.c.id == 1).values(value=_counter.c.value + n).returning(_counter.c.value)
+    ).scalar()
+    if last is None:
+        # banco criado sem a migration (create_all em dev): cria o contador
+        db.execute(insert(_counter).values(id=1, value=n))
+        last = n
+    return last - n + 1
+
+
+def current_seq(db: Session) -> int:
+    return db.execute(select(_counter.c.value).where(_counter.c.id == 1)).scalar() or 0
+
+
+def table_version(db: Session, entity: str) -> int:
+    """Maior changeSeq da tabela (linhas vivas e tombstones): muda a cada escrita, em qualquer worker."""
+    model = SYNC_ENTITIES[entity]
+    live = select(func.max(model.changeSeq)).scalar_subquery()
+    dead = select(func.max(SyncTombstone.changeSeq)).where(SyncTombstone.entity == entity).scalar_subquery()
+    row = db.execute(select(live, dead)).one()
+    return max(row[0] or 0, row[1] or 0)
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _assign_change_seq(session: Session, flush_context, instances):
+    changed = [o for o in session.new if isinstance(o, _TRACKED)]
+    changed += [
+        o for o in session.dirty
+        if isinstance(o, _TRACKED) and session.is_modified(o, include_collections=False)
+    ]
+    deleted = [o for o in session.deleted if isinstance(o, _TRACKED)]
+    if not changed and not deleted:
+        return
+
+    seq = reserve_seq(session, len(changed) + len(deleted))
+    for o in changed:
+        o.changeSeq = seq
+        seq += 1
+    for o in deleted:
+        session.add(SyncTombstone(entity=o.__tablename__, entityId=str(o.id), changeSeq=seq))
+        seq += 1
+
+
+def _columns(model):
+    return [c for c in model.__table__.columns if c.key != "changeSeq"]
+
+
+def changes_since(db: Session, since: int, limit: int = SYNC_DEFAULT_LIMIT) -> dict:
+    """
+    Tudo que mudou com since < changeSeq <= cursor.
+    Se alguma tabela bater no limit, cursor para antes do que ficou de fora (hasMore=True);
+    linhas além do cursor que vieram de outras tabelas chegam de novo na próxima chamada
+    (o cliente aplica como upsert, então repetir é inofensivo).
+    """
+    snapshot = current_seq(db)
+    cursor = snapshot
+    has_more = False
+
+    # entity -> {id: (changeSeq, linha)}
+    upserts: Dict[str, Dict[str, tuple]] = {}
+    for name, model in SYNC_ENTITIES.items():
+        cols = _columns(model)
+        keys = [c.key for c in cols]
+        rows = db.execute(
+            select(*cols, model.changeSeq)
+            .where(model.changeSeq > since, model.changeSeq <= snapshot)
+            .order_by(model.changeSeq)
+            .limit(limit)
+        ).all()
+        upserts[name] = {str(r[0]): (r[-1], dict(zip(keys, r[:-1]))) for r in rows}
+        if len(rows) == limit:
+            has_more = True
+            cursor = min(cursor, rows[-1][-1])
+
+    tombstones = db.execute(
+        select(SyncTombstone.entity, SyncTombstone.entityId, SyncTombstone.changeSeq)
+        .where(SyncTombstone.changeSeq > since, SyncTombstone.changeSeq <= snapshot)
+        .order_by(SyncTombstone.changeSeq)
+        .limit(limit)
+    ).all()
+    if len(tombstones) == limit:
+        has_more = True
+        cursor = min(cursor, tombstones[-1][2])
+
+    # id apagado e recriado (ou o contrário) na mesma janela: vale o mais recente
+    deleted: Dict[str, List[str]] = {name: [] for name in SYNC_ENTITIES}
+    for entity, entity_id, seq in tombstones:
+        rows = upserts.get(entity, {})
+        current = rows.get(entity_id)
+        if current is not None:
+            if current[0] > seq:
+                continue
+            del rows[entity_id]
+        deleted.setdefault(entity, []).append(entity_id)
+
+    return {
+        "since": since,
+        "cursor": max(cursor, since),
+        "hasMore": has_more,
+        **{name: [row for _, row in rows.values()] for name, rows in upserts.items()},
+        "deleted": deleted,
+    }
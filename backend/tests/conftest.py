@@ -0,0 +1,6 @@
+# conftest.py
+"""Os módulos do backend são importados pelo nome (from db import ...), como no uvicorn."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,143 @@
+# test_email_outbox.py
+"""
+Outbox contra um servidor SMTP local de verdade (aiosmtpd), com o banco em SQLite em memória.
+"""
+import socket
+from datetime import timedelta
+from email import message_from_bytes, policy
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+
+import email_outbox
+from models import Base, EmailOutbox
+
+
+class _Handler:
+    """Aceita tudo, menos destinatários "reject@" (550) e "later@" (451)."""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("reject@"):
+            return "550 5.1.1 mailbox unavailable"
+        if address.startswith("later@"):
+            return "451 4.3.0 try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 Message accepted for delivery"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def outbox_db(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    monkeypatch.setattr(email_outbox, "SessionLocal", Session)
+    yield Session
+    engine.dispose()
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    handler = _Handler()
+    controller = aiosmtpd_controller.Controller(handler, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    monkeypatch.setenv("SMTP_HOST", "127.0.0.1")
+    monkeypatch.setenv("SMTP_PORT", str(controller.port))
+    monkeypatch.setenv("SMTP_TLS", "0")
+    monkeypatch.setenv("SMTP_FROM", "no-reply@test.local")
+    monkeypatch.delenv("SMTP_USER", raising=False)
+    monkeypatch.delenv("SMTP_PASS", raising=False)
+    yield handler
+    controller.stop()
+
+
+@pytest.fixture
+def worker():
+    w = email_outbox.EmailWorker()
+    yield w
+    w._close()
+
+
+def _row(Session, email_id):
+    with Session() as db:
+        return db.execute(select(EmailOutbox).where(EmailOutbox.id == email_id)).scalar_one()
+
+
+def test_queue_and_process_batch_delivers(outbox_db, smtp_server, worker):
+    email_id = email_outbox.queue_email("user@test.local", "Seu código", "Código: 123456")
+
+    assert worker.process_batch() == 1
+
+    assert len(smtp_server.messages) == 1
+    envelope = smtp_server.messages[0]
+    assert envelope.mail_from == "no-reply@test.local"
+    assert envelope.rcpt_tos == ["user@test.local"]
+    msg = message_from_bytes(envelope.content, policy=policy.default)
+    assert msg["Subject"] == "Seu código"
+    assert msg.get_content().strip() == "Código: 123456"
+
+    row = _row(outbox_db, email_id)
+    assert row.status == "sent"
+    assert row.attempts == 1
+    assert row.sentAt is not None
+    assert worker.process_batch() == 0
+
+
+def test_permanent_refusal_marks_failed(outbox_db, smtp_server, worker):
+    email_id = email_outbox.queue_email("reject@test.local", "Seu código", "Código: 1")
+
+    worker.process_batch()
+
+    row = _row(outbox_db, email_id)
+    assert row.status == "failed"
+    assert "550" in row.lastError
+    assert smtp_server.messages == []
+
+
+def test_temporary_refusal_is_rescheduled(outbox_db, smtp_server, worker):
+    email_id = email_outbox.queue_email("later@test.local", "Seu código", "Código: 2")
+    before = email_outbox._now_utc().replace(tzinfo=None)
+
+    worker.process_batch()
+
+    row = _row(outbox_db, email_id)
+    assert row.status == "pending"
+    assert row.attempts == 1
+    assert "451" in row.lastError
+    # backoff: 1ª retentativa em ~EMAIL_OUTBOX_RETRY_BASE_SEC (±20%)
+    delay = row.nextAttemptAt.replace(tzinfo=None) - before
+    assert delay >= timedelta(seconds=email_outbox.EMAIL_OUTBOX_RETRY_BASE_SEC * 0.8)
+    assert worker.process_batch() == 0
+
+
+def test_connection_error_reschedules_whole_batch(outbox_db, monkeypatch, worker):
+    monkeypatch.setenv("SMTP_HOST", "127.0.0.1")
+    monkeypatch.setenv("SMTP_PORT", str(_free_port()))  # ninguém escutando
+    monkeypatch.setenv("SMTP_TLS", "0")
+    ids = [email_outbox.queue_email(f"user{i}@test.local", "Seu código", "Código") for i in range(3)]
+
+    assert worker.process_batch() == 3
+
+    for email_id in ids:
+        row = _row(outbox_db, email_id)
+        assert row.status == "pending"
+        assert row.attempts == 1
+        assert row.lastError
+        assert row.nextAttemptAt.replace(tzinfo=None) > email_outbox._now_utc().replace(tzinfo=None)
+    assert worker.retried == 3